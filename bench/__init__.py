@@ -0,0 +1,183 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+import qca
+import qca.quantum_computing
+from qca import create_neighborhood, quantum_collapse, quantum_collapse_qc
+from qca.decoherence import LowestEntropyDechorence, PriorityEntropyDechorence
+from qca.domain import num_words
+from qca.input import create_adjacency_matrix, create_patches, save_output
+from qca.quantum_computing import build_quantum_collapse_algorithm_circuit, build_quantum_collapse_grover_search_circuit
+
+# synthetic tileset of num_states distinct patch_size x patch_size RGBA tiles
+# every border of a tile is one of num_edge_colors colors (the corners are black) so tiles with the same border color are adjacent
+# in that direction and the interior pixels are random so the tiles are distinct
+def synthetic_tiles(num_states, patch_size=3, num_edge_colors=2, seed=0):
+    rng = np.random.default_rng(seed)
+    edge_colors = rng.integers(0, 256, size=(num_edge_colors, 4), dtype=np.uint8)
+    edge_colors[:, 3] = 255
+
+    tiles = np.empty(num_states, dtype=object)
+    for i in range(num_states):
+        tile = rng.integers(0, 256, size=(patch_size, patch_size, 4), dtype=np.uint8)
+        tile[..., 3] = 255
+
+        top, bottom, left, right = edge_colors[rng.integers(0, num_edge_colors, size=4)]
+        tile[0], tile[-1], tile[:, 0], tile[:, -1] = top, bottom, left, right
+        tile[0, 0] = tile[0, -1] = tile[-1, 0] = tile[-1, -1] = (0, 0, 0, 255)
+
+        tiles[i] = tile
+
+    return tiles
+
+# png of tiles placed at random in a grid_size grid, returns the file path
+def synthetic_tileset_image(tiles, grid_size, directory, seed=0):
+    rng = np.random.default_rng(seed)
+    patch_size = tiles[0].shape[0]
+
+    image = np.zeros((grid_size[0] * patch_size, grid_size[1] * patch_size, 4), dtype=np.uint8)
+    for index in np.ndindex(grid_size):
+        image[index[0] * patch_size:(index[0] + 1) * patch_size, index[1] * patch_size:(index[1] + 1) * patch_size] = tiles[rng.integers(len(tiles))]
+
+    file_path = os.path.join(directory, f'tileset_{len(tiles)}_{grid_size[0]}x{grid_size[1]}.png')
+    Image.fromarray(image).save(file_path)
+
+    return file_path
+
+# best wall time of repeat runs of fn, setup runs before every run and is not timed
+def measure(fn, repeat=3, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        start_time = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start_time)
+
+    return min(times)
+
+# best wall time of importing module in a fresh interpreter, modules imported by the interpreter itself are not counted
+def measure_import(module, repeat=3):
+    code = f'import time; start_time = time.perf_counter(); import {module}; print(time.perf_counter() - start_time)'
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+        times.append(float(output))
+
+    return min(times)
+
+def _clear_circuit_caches():
+    qca._transpiled_circuits.clear()
+    qca.quantum_computing._grover_circuits.clear()
+
+# runs every benchmark and returns a dict of benchmark name to {'seconds': best wall time, ...parameters}
+# num_states and grid_sizes configure the classical benchmarks, the quantum computing benchmarks use a small fixed grid since
+# their cost grows exponentially
+def run_benchmarks(num_states=(8, 32), grid_sizes=((16, 16), (48, 48)), repeat=3, quantum_computing=True, seed=0):
+    results = {}
+    neighborhood = create_neighborhood(num_dimensions=2)
+
+    def record(name, seconds, **parameters):
+        results[name] = dict(seconds=seconds, repeat=repeat, **parameters)
+
+    # startup of a classical run against the qiskit import cost quantum computing runs pay on top of it
+    record('import[qca]', measure_import('qca', repeat=repeat))
+    if quantum_computing:
+        record('import[qca.quantum_computing]', measure_import('qca.quantum_computing', repeat=repeat))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for s in num_states:
+            tiles = synthetic_tiles(s, seed=seed)
+            adjacency_matrix = create_adjacency_matrix(tiles, neighborhood)
+
+            image_path = synthetic_tileset_image(tiles, (64, 64), directory, seed=seed)
+            record(f'create_patches[states={s}]', measure(lambda: create_patches(image_path, (3, 3)), repeat=repeat), states=s, input_size=[192, 192])
+
+            record(f'create_adjacency_matrix[states={s}]', measure(lambda: create_adjacency_matrix(tiles, neighborhood), repeat=repeat), states=s)
+
+            for grid_size in grid_sizes:
+                grid_name = f'{grid_size[0]}x{grid_size[1]}'
+
+                def reseed():
+                    random.seed(seed)
+                    np.random.seed(seed)
+
+                output_assignments = np.random.default_rng(seed).integers(-1, s, size=grid_size)
+                output_path = os.path.join(directory, 'output.png')
+                record(f'save_output[states={s},grid={grid_name}]', measure(lambda: save_output(output_path, output_assignments, tiles, 'image'), repeat=repeat),
+                       states=s, grid=list(grid_size))
+
+                record(f'quantum_collapse[states={s},grid={grid_name}]',
+                       measure(lambda: quantum_collapse(range(s), grid_size, neighborhood, adjacency_matrix, backtrack_limit=100), repeat=repeat, setup=reseed),
+                       states=s, grid=list(grid_size))
+
+                # selection on a partially collapsed output, selectors are reset once like quantum_collapse does before generating
+                rng = np.random.default_rng(seed)
+                output_curr_num_possible_states = rng.integers(1, s + 1, size=grid_size)
+                output_assignments = np.where(output_curr_num_possible_states == 1, 0, -1)
+                output = np.zeros(grid_size + (num_words(s),), dtype=np.uint64)
+                num_selections = 100
+
+                for selector in [LowestEntropyDechorence(), PriorityEntropyDechorence()]:
+                    selector.reset(output_curr_num_possible_states, output_assignments)
+
+                    def select():
+                        for _ in range(num_selections):
+                            selector.select(output, output_curr_num_possible_states, output_assignments)
+
+                    record(f'{type(selector).__name__}.select[states={s},grid={grid_name}]', measure(select, repeat=repeat) / num_selections,
+                           states=s, grid=list(grid_size))
+
+    if quantum_computing:
+        s = 4
+        grid_size = (2, 2)
+        tiles = synthetic_tiles(s, seed=seed)
+        adjacency_matrix = create_adjacency_matrix(tiles, neighborhood)
+
+        def build_grover_search_circuit():
+            circuit, (output_qrs, _), (neighborhood_constraint_qrs, neighborhood_constraint_output_mapping), _ = build_quantum_collapse_algorithm_circuit(range(s), neighborhood, np.ones(grid_size + (s,)))
+            build_quantum_collapse_grover_search_circuit(circuit, adjacency_matrix, output_qrs, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, num_iterations=2)
+
+        record('build_quantum_collapse_grover_search_circuit[states=4,grid=2x2]', measure(build_grover_search_circuit, repeat=repeat, setup=_clear_circuit_caches),
+               states=s, grid=list(grid_size))
+
+        for engine in qca.QC_ENGINES:
+            record(f'quantum_collapse_qc[states=4,grid=2x2,engine={engine}]',
+                   measure(lambda: quantum_collapse_qc(range(s), grid_size, neighborhood, adjacency_matrix, num_iterations=2, max_attempts=64, engine=engine), repeat=repeat, setup=_clear_circuit_caches),
+                   states=s, grid=list(grid_size), engine=engine)
+
+    return results
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(), 'processor': platform.processor()}
+
+def save_results(file_path, results):
+    with open(file_path, 'w') as file:
+        json.dump({'environment': environment(), 'benchmarks': results}, file, indent=2)
+
+def load_results(file_path):
+    with open(file_path) as file:
+        return json.load(file)['benchmarks']
+
+# returns [(name, baseline seconds, seconds, ratio, regressed)] of the benchmarks in both results
+# a benchmark regressed when it is more than tolerance (a fraction) slower than the baseline
+def compare_results(results, baseline, tolerance=0.2):
+    comparison = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        ratio = result['seconds'] / baseline[name]['seconds']
+        comparison.append((name, baseline[name]['seconds'], result['seconds'], ratio, ratio > 1 + tolerance))
+
+    return comparison
@@ -0,0 +1,35 @@
+import argparse
+import sys
+
+from bench import compare_results, load_results, run_benchmarks, save_results
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--states', type=lambda s: tuple(map(int, s.split(','))), default=(8, 32), required=False, help='CSV of numbers of states of the synthetic tilesets')
+parser.add_argument('--grid_sizes', type=lambda s: tuple(tuple(map(int, g.split('x'))) for g in s.split(',')), default=((16, 16), (48, 48)), required=False, help='CSV of output sizes like 16x16,48x48')
+parser.add_argument('--repeat', type=int, default=3, required=False, help='Number of runs of every benchmark, the best time is reported')
+parser.add_argument('--no_qc', action='store_true', required=False, help='Skip the quantum computing benchmarks')
+parser.add_argument('--output', '-o', type=str, required=False, help='JSON file the results are saved to')
+parser.add_argument('--baseline', type=str, required=False, help='JSON file of earlier results to compare against')
+parser.add_argument('--tolerance', type=float, default=0.2, required=False, help='Fraction a benchmark may be slower than the baseline before it is flagged as a regression')
+
+args = parser.parse_args()
+
+results = run_benchmarks(num_states=args.states, grid_sizes=args.grid_sizes, repeat=args.repeat, quantum_computing=not args.no_qc)
+
+for name, result in results.items():
+    print(f"{name}: {result['seconds'] * 1000:.3f} ms")
+
+if args.output is not None:
+    save_results(args.output, results)
+
+if args.baseline is not None:
+    comparison = compare_results(results, load_results(args.baseline), tolerance=args.tolerance)
+
+    print()
+    for name, baseline_seconds, seconds, ratio, regressed in comparison:
+        print(f"{'REGRESSION ' if regressed else ''}{name}: {baseline_seconds * 1000:.3f} ms -> {seconds * 1000:.3f} ms ({ratio:.2f}x)")
+
+    # a non zero exit status lets scripts fail on regressions
+    if any(regressed for *_, regressed in comparison):
+        sys.exit(1)
@@ -1,81 +1,293 @@
-from collections import deque
+import importlib
+import time
 from itertools import zip_longest
 from typing import Tuple
 
 import numpy as np
-from qiskit import Aer, transpile, assemble
 
-from .decoherence import LowestEntropyDechorence
+from .decoherence import PriorityEntropyDechorence
+from .domain import domain_states, pack_domains, popcount, state_domain, unpack_domains
 from .collapse import BinaryCollapse
-from .quantum_computing import *
-
+from .propagation import BitsetPropagation, undo_trail
+from .topology import GridTopology, OUT_OF_BOUNDS
+from .counting import grover_num_iterations
+from .simulation import sample_grover_search
+from .backends import get_backend
+from .cache import LRUCache
+
+# backtrack_limit is the number of times a contradiction can be undone before giving up
+# with a limit of 0 generation stops at the first contradiction
+# initial_output optionally restricts the possible states of output parts before generation (output_size + (len(states),))
+# the possible states are packed into uint64 words (see qca.domain), the returned output is
+# output_size + (num_words,) unless unpack_output expands it to output_size + (len(states),)
+# max_collapses optionally stops generation after that many collapses of output parts with more than one possible state
+# (output parts that propagation already fixed are assigned on the way without counting), the remaining output parts stay unassigned
+# metrics (see qca.metrics) optionally collects the wall time of every phase, contradictions and backtracks
+# (the selector, collapse and propagation count their own events when they are given metrics)
+# the selector keeps state between collapses, a new PriorityEntropyDechorence is used when dechorence_selector is None
 def quantum_collapse(
     states,
     output_size: Tuple[int, ...],
     neighborhood,
     adjacency_contraint,
-    dechorence_selector=LowestEntropyDechorence(),
+    dechorence_selector=None,
     collapse = BinaryCollapse(),
+    propagation=BitsetPropagation(),
+    topology=None,
+    backtrack_limit=0,
+    initial_output=None,
+    unpack_output=False,
+    max_collapses=None,
+    metrics=None,
 ):
-    output = np.ones((output_size + (len(states),)))
-    output_curr_num_possible_states = np.full((output_size), len(states), dtype=int)
+    if metrics is not None:
+        start_time = time.perf_counter()
+
+    if dechorence_selector is None:
+        dechorence_selector = PriorityEntropyDechorence()
+
+    if topology is None:
+        topology = GridTopology(neighborhood, output_size)
+
+    if initial_output is None:
+        output = pack_domains(np.ones(len(states), dtype=bool))
+        output = np.tile(output, output_size + (1,))
+    else:
+        output = pack_domains(initial_output)
+    output_curr_num_possible_states = popcount(output)
     output_assignments = np.full((output_size), -1, dtype=int)
 
-    output_is_consistent = True
+    # adjacency_contraint[state, neighborhood index] are the packed states a neighbor can take
+    adjacency_contraint = pack_domains(np.asarray(adjacency_contraint) == 1)
+
+    # flat views share memory with the output arrays
+    flat_output = output.reshape(topology.size, -1)
+    flat_output_curr_num_possible_states = output_curr_num_possible_states.reshape(-1)
+    flat_output_assignments = output_assignments.reshape(-1)
+
+    # undo trail of (flat index, removed states) and stack of (trail length, flat index, state) collapse decisions
+    trail = [] if backtrack_limit > 0 else None
+    decisions = []
+    num_backtracks = 0
+    num_collapses = 0
+    # collapses assign one output part and backtracks unassign one, so the loop does not scan the output for unassigned parts
+    num_unassigned = topology.size
+
+    output_is_consistent = bool(np.all(output_curr_num_possible_states > 0))
+
+    # propagate the states removed by the initial output
+    if initial_output is not None:
+        for flat_index in np.flatnonzero(flat_output_curr_num_possible_states < len(states)):
+            if not output_is_consistent:
+                break
+            output_is_consistent = propagation(topology.index(flat_index), output, output_curr_num_possible_states, topology, adjacency_contraint, trail=trail, metrics=metrics)
+
+    dechorence_selector.reset(output_curr_num_possible_states, output_assignments)
 
-    while not np.all(output_assignments != -1) and output_is_consistent:
+    if metrics is not None:
+        start_time = _lap(metrics, 'setup', start_time)
+
+    while num_unassigned > 0 and output_is_consistent and (max_collapses is None or num_collapses < max_collapses):
         collapsing_superposition = dechorence_selector(output, output_curr_num_possible_states, output_assignments)
-        collapsed_index, _ = collapse(collapsing_superposition, output, output_curr_num_possible_states, output_assignments)
-        propagation_queue = deque()
+        collapsed_flat_index = topology.flat_index(collapsing_superposition)
+
+        # the lowest entropy output parts are the ones with one possible state, assigning them is no choice
+        if flat_output_curr_num_possible_states[collapsed_flat_index] > 1:
+            num_collapses += 1
+
+        if metrics is not None:
+            start_time = _lap(metrics, 'select', start_time)
+
+        if trail is not None:
+            possible_states = flat_output[collapsed_flat_index].copy()
+
+        collapsed_index, collapsed_state = collapse(collapsing_superposition, output, output_curr_num_possible_states, output_assignments)
+        num_unassigned -= 1
 
-        propagation_queue.append(collapsed_index)
+        if trail is not None:
+            decisions.append((len(trail), collapsed_flat_index, collapsed_state))
+            trail.append((collapsed_flat_index, possible_states & ~flat_output[collapsed_flat_index]))
+
+        updated_indexes = [collapsed_flat_index]
+
+        if metrics is not None:
+            start_time = _lap(metrics, 'collapse', start_time)
 
         # propagate updates through output
-        while len(propagation_queue) > 0:
-            index = propagation_queue.pop()
+        output_is_consistent = propagation(collapsed_index, output, output_curr_num_possible_states, topology, adjacency_contraint, updated_indexes=updated_indexes, trail=trail, metrics=metrics)
+
+        if metrics is not None:
+            start_time = _lap(metrics, 'propagate', start_time)
+            if not output_is_consistent:
+                metrics.count('contradictions')
+
+        # on a contradiction roll back to the last decision and ban the state it chose
+        while not output_is_consistent and len(decisions) > 0 and num_backtracks < backtrack_limit:
+            num_backtracks += 1
 
-            for n_i, neighbor_vector in enumerate(neighborhood):
-                neighbor_index = np.array(index) + np.array(neighbor_vector)
+            if metrics is not None:
+                metrics.count('backtracks')
 
-                # skip out of bounds indexes
-                if np.any(neighbor_index < 0) or np.any(neighbor_index > np.array(output.shape[:-1]) - 1):
-                    continue
+            trail_length, flat_index, state = decisions.pop()
+            undo_trail(trail, trail_length, output, output_curr_num_possible_states, topology, updated_indexes=updated_indexes)
+            flat_output_assignments[flat_index] = -1
+            num_unassigned += 1
 
-                num_possible_states_before_update = output_curr_num_possible_states[tuple(neighbor_index)]
+            # the ban belongs to the previous decision so it is undone if that decision is rolled back
+            banned_state = state_domain(state, flat_output.shape[-1])
+            flat_output[flat_index] &= ~banned_state
+            flat_output_curr_num_possible_states[flat_index] -= 1
+            trail.append((flat_index, banned_state))
+            updated_indexes.append(flat_index)
 
-                for neighbor_state_idx, v in enumerate(output[tuple(neighbor_index)]):
-                    if v == 0:
-                        continue
+            if flat_output_curr_num_possible_states[flat_index] > 0:
+                output_is_consistent = propagation(topology.index(flat_index), output, output_curr_num_possible_states, topology, adjacency_contraint, updated_indexes=updated_indexes, trail=trail, metrics=metrics)
 
-                    # loop through output part that was popped to see if neighbor states are possible based on neighborhood constraint
-                    state_is_possible = False
-                    for state_index, v_ in enumerate(output[tuple(index)]):
-                        if v_ == 0:
-                            continue
-                        if adjacency_contraint[state_index, n_i, neighbor_state_idx] == 1:
-                            state_is_possible = True
-                            break
+                if metrics is not None and not output_is_consistent:
+                    metrics.count('contradictions')
 
-                    if not state_is_possible:
-                        output[tuple(neighbor_index)][neighbor_state_idx] = 0
-                        output_curr_num_possible_states[tuple(neighbor_index)] -= 1
+        if metrics is not None:
+            start_time = _lap(metrics, 'backtrack', start_time)
 
-                # possible states are zero so output is not inconsistent
-                if output_curr_num_possible_states[tuple(neighbor_index)] == 0:
-                    output_is_consistent = False
-                # if number of possible states has changed then propagate
-                elif output_curr_num_possible_states[tuple(neighbor_index)] - num_possible_states_before_update != 0:
-                    propagation_queue.append(neighbor_index)
+        # let the selector know which output parts changed their number of possible states
+        dechorence_selector.update(updated_indexes, output_curr_num_possible_states, output_assignments)
 
+        if metrics is not None:
+            start_time = _lap(metrics, 'selector_update', start_time)
 
     # collapse states that only have one possible state
     for i, v in np.ndenumerate(output_curr_num_possible_states):
         if v == 1 and output_assignments[i] == -1:
-            value = np.argwhere(output[i] > 0)[0]
-            output_assignments[i] = value
+            output_assignments[i] = domain_states(output[i])[0]
+
+    if unpack_output:
+        output = unpack_domains(output, len(states))
+
+    if metrics is not None:
+        _lap(metrics, 'finish', start_time)
 
     return output_is_consistent, output_assignments, output
 
+# adds the wall time since start_time to the phase name of metrics and returns the current time
+def _lap(metrics, name, start_time):
+    current_time = time.perf_counter()
+    metrics.add_time(name, current_time - start_time)
+    return current_time
+
+# engines quantum_collapse_qc can run the grover search on
+QC_ENGINES = ('aer', 'numpy')
+
+# transpiled quantum collapse circuits with their output part quantum register mapping of the most recently used keys,
+# see _get_transpiled_circuit
+_transpiled_circuits = LRUCache(maxsize=32)
+
+# output_domains (output_size + (len(states),)) optionally restricts the possible states of the output parts, output parts
+# with one possible state are left out of the circuit and the others get registers over their local states
+# returns (transpiled circuit, output part quantum register mapping, output quantum register sizes, local states of the registers)
+# where the local states are None without output_domains
+def _get_transpiled_circuit(states, output_size, neighborhood, neighborhood_constraint, num_iterations, topology, sim, cache_dir=None, synthesis='esop', output_domains=None):
+    from qiskit import ClassicalRegister, transpile
+    from .quantum_computing import (build_quantum_collapse_algorithm_circuit, build_quantum_collapse_grover_search_circuit, constraint_hash, flatten,
+                                    local_domain_states, local_neighborhood_constraints, set_quantum_collapse_algorithm_superposition)
+
+    key = (len(states), tuple(output_size), tuple(map(tuple, neighborhood)), constraint_hash(neighborhood_constraint), num_iterations, synthesis, sim,
+           None if output_domains is None else constraint_hash(output_domains))
+
+    if key not in _transpiled_circuits:
+        output = np.ones(output_size + (len(states),))
+        output_mask = output_num_states = edge_constraints = output_local_states = None
+
+        if output_domains is not None:
+            output_num_states = output_domains.sum(axis=-1)
+            output_mask = output_num_states > 1
+
+        circuit, (output_qrs, output_part_qr_mapping), (neighborhood_constraint_qrs, neighborhood_constraint_output_mapping), feasible_qr = build_quantum_collapse_algorithm_circuit(
+            states, neighborhood, output, output_mask=output_mask, topology=topology, output_num_states=output_num_states)
+
+        if output_domains is not None:
+            edge_constraints = local_neighborhood_constraints(neighborhood_constraint, output_domains, output_qrs, output_part_qr_mapping, neighborhood_constraint_output_mapping)
+            output_local_states = [local_domain_states(output_domains[o_i], output_qr.size) for output_qr, o_i in zip(output_qrs, output_part_qr_mapping)]
+
+        set_quantum_collapse_algorithm_superposition(circuit, output_qrs)
+
+        # the oracle flips the feasible qubit, in the |-> state the flip is a phase on the feasible output states
+        circuit.x(feasible_qr)
+        circuit.h(feasible_qr)
+
+        qc_grover = build_quantum_collapse_grover_search_circuit(circuit, neighborhood_constraint, output_qrs, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, num_iterations=num_iterations, to_gate=True, cache_dir=cache_dir, synthesis=synthesis, edge_constraints=edge_constraints)
+
+        circuit.append(qc_grover, circuit.qubits)
+
+        cbits = ClassicalRegister(sum(output_qr.size for output_qr in output_qrs), name='cbits')
+
+        circuit.add_register(cbits)
+
+        circuit.measure(flatten([qubits for qubits in output_qrs]), cbits._bits)
+
+        _transpiled_circuits[key] = transpile(circuit, sim), output_part_qr_mapping, [output_qr.size for output_qr in output_qrs], output_local_states
+
+    return _transpiled_circuits[key]
+
+# converts a measured bit string of the output quantum registers into output assignments
+# output_qr_sizes is the number of qubits of every output quantum register, by default they all have the same size
+def decode_output_assignments(value_str, output_part_qr_mapping, output_size, output_qr_sizes=None):
+    output_assignments = np.full((output_size), -1, dtype=int)
+
+    if output_qr_sizes is None:
+        output_qr_sizes = [len(value_str) // len(output_part_qr_mapping)] * len(output_part_qr_mapping)
+
+    # the first measured bit is the last character of the bit string
+    end = len(value_str)
+    for o_i, num_bits in zip(output_part_qr_mapping, output_qr_sizes):
+        output_assignments[o_i] = int(value_str[end - num_bits:end], 2)
+        end -= num_bits
+
+    return output_assignments
+
+# restricts the possible states of every output part to the states that allow, and are allowed by, its neighbors with one
+# possible state (fixed neighbors) in every direction, repeated until nothing changes since restricted output parts can become fixed
+# output_domains is output_size + (len(states),) boolean
+def restrict_to_fixed_neighbors(output_domains, neighborhood, neighborhood_constraint, topology=None):
+    if topology is None:
+        topology = GridTopology(neighborhood, output_domains.shape[:-1])
+
+    allowed = np.asarray(neighborhood_constraint) == 1
+    neighborhood_indexes = {tuple(n): n_i for n_i, n in enumerate(neighborhood)}
+    opposite_indexes = [neighborhood_indexes.get(tuple(-i for i in n)) for n in neighborhood]
+
+    output_domains = np.array(output_domains, dtype=bool).reshape(topology.size, -1)
+
+    while True:
+        fixed = output_domains.sum(axis=-1) == 1
+        restricted_domains = output_domains.copy()
+
+        for n_i in range(len(neighborhood)):
+            neighbor_indexes = topology.neighbors[:, n_i]
+            flat_indexes = np.flatnonzero((neighbor_indexes != OUT_OF_BOUNDS) & fixed[neighbor_indexes])
+            neighbor_states = np.argmax(output_domains[neighbor_indexes[flat_indexes]], axis=-1)
+
+            restricted_domains[flat_indexes] &= allowed[:, n_i, neighbor_states].T
+            if opposite_indexes[n_i] is not None:
+                restricted_domains[flat_indexes] &= allowed[neighbor_states, opposite_indexes[n_i], :]
+
+        if np.array_equal(restricted_domains, output_domains):
+            return output_domains.reshape(topology.shape + (-1,))
+
+        output_domains = restricted_domains
+
+# the circuit is transpiled once (and cached between calls) and run as one job with max_attempts shots
+# every measured output is checked and the first feasible one is returned
+# the oracle and diffuser are also cached as qpy in cache_dir when it is given
+# synthesis selects how the neighborhood constraint is built (see ORACLE_SYNTHESIS_MODES)
+# return_distribution also returns a dict of feasible flattened output assignments (tuple) to the number of shots that measured them
+# output_domains (output_size + (len(states),)) optionally restricts the possible states of the output parts, output parts with one
+# possible state after restrict_to_fixed_neighbors are fixed and only the others are searched (see quantum_collapse_hybrid)
+# num_iterations 'auto' counts the solutions classically (see qca.counting) and uses the optimal number of grover iterations
+# without sim the circuit resources are estimated before it is built and the aer simulation method is picked with select_simulation_method
+# (resource_limits are its keyword arguments), a ResourceLimitError is raised when the circuit is too large to simulate
+# engine 'numpy' simulates the grover search on the amplitudes of the output quantum registers instead of running the circuit
+# on aer (see qca.simulation), its amplitude vector is bounded by the max_statevector_memory resource limit
+# metrics (see qca.metrics) optionally collects the wall time of every phase, the circuit size and the measured shots
 def quantum_collapse_qc(
     states,
     output_size: Tuple[int, ...],
@@ -83,54 +295,165 @@ def quantum_collapse_qc(
     neighborhood_constraint,
     num_iterations=1,
     max_attempts=1,
-    sim=Aer.get_backend('aer_simulator')
+    sim=None,
+    return_distribution=False,
+    cache_dir=None,
+    synthesis='esop',
+    output_domains=None,
+    resource_limits=None,
+    engine='aer',
+    metrics=None,
 ):
-    output = np.ones(output_size + (len(states),))
-    output_assignments = np.full((output_size), -1, dtype=int)
-    circuit, (output_qrs, output_part_qr_mapping), (neighborhood_constraint_qrs, neighborhood_constraint_output_mapping), feasible_qr = build_quantum_collapse_algorithm_circuit(states, neighborhood, output)
+    if engine not in QC_ENGINES:
+        raise ValueError('Invalid engine')
+
+    if metrics is not None:
+        start_time = time.perf_counter()
+        metrics.record('engine', engine)
+
+    topology = GridTopology(neighborhood, output_size)
+    fixed_assignments = None
+
+    if output_domains is not None:
+        output_domains = restrict_to_fixed_neighbors(output_domains, neighborhood, neighborhood_constraint, topology=topology)
+        output_num_states = output_domains.sum(axis=-1)
+        fixed_assignments = np.where(output_num_states == 1, np.argmax(output_domains, axis=-1), -1)
+
+        # nothing is left to search when an output part has no possible states or every output part is fixed
+        if np.any(output_num_states == 0) or np.all(output_num_states == 1):
+            feasible = bool(np.all(output_num_states == 1)) and feasible_on_neighborhood_constraint(fixed_assignments, neighborhood_constraint, neighborhood, topology=topology)
+            if return_distribution:
+                return feasible, fixed_assignments, {tuple(fixed_assignments.reshape(-1)): max_attempts} if feasible else {}
+            return feasible, fixed_assignments
+
+    if num_iterations == 'auto':
+        num_iterations = grover_num_iterations(output_size, neighborhood, neighborhood_constraint, output_domains=output_domains)
+
+    if metrics is not None:
+        start_time = _lap(metrics, 'count_solutions', start_time)
+        metrics.record('num_iterations', num_iterations)
+
+    if engine == 'numpy':
+        from .quantum_computing import grover_search_layout
+
+        output_parts, edges = grover_search_layout(output_size, neighborhood, neighborhood_constraint, output_domains=output_domains, topology=topology)
+
+        output_part_qr_mapping = [topology.index(flat_index) for flat_index, _, _ in output_parts]
+        output_qr_sizes = [num_qubits for _, _, num_qubits in output_parts]
+        output_local_states = None if output_domains is None else [local_states for _, local_states, _ in output_parts]
+
+        if metrics is not None:
+            start_time = _lap(metrics, 'build_circuit', start_time)
+            metrics.record('qubits', sum(output_qr_sizes))
+
+        memory = sample_grover_search(output_parts, edges, num_iterations, max_attempts, max_memory=(resource_limits or {}).get('max_statevector_memory', 2**32))
+    else:
+        if sim is None:
+            from .quantum_computing import estimate_quantum_collapse_resources, select_simulation_method
+
+            estimate = estimate_quantum_collapse_resources(output_size, neighborhood, neighborhood_constraint, num_iterations=num_iterations, output_domains=output_domains, synthesis=synthesis, topology=topology)
+            sim = get_backend(f'aer_simulator_{select_simulation_method(estimate, **(resource_limits or {}))}')
+
+            if metrics is not None:
+                start_time = _lap(metrics, 'estimate_resources', start_time)
 
-    set_quantum_collapse_algorithm_superposition(circuit, output_qrs)
+        transpiled_qc, output_part_qr_mapping, output_qr_sizes, output_local_states = _get_transpiled_circuit(
+            states, output_size, neighborhood, neighborhood_constraint, num_iterations, topology, sim, cache_dir=cache_dir, synthesis=synthesis, output_domains=output_domains)
 
-    qc_grover = build_quantum_collapse_grover_search_circuit(circuit, neighborhood_constraint, output_qrs, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, num_iterations=num_iterations, to_gate=True)
+        if metrics is not None:
+            start_time = _lap(metrics, 'build_circuit', start_time)
+            metrics.record('simulator', sim.name if isinstance(sim.name, str) else sim.name())
+            metrics.record('qubits', transpiled_qc.num_qubits)
+            metrics.record('depth', transpiled_qc.depth())
+            metrics.record('size', transpiled_qc.size())
+            start_time = time.perf_counter()
 
-    circuit.append(qc_grover, circuit.qubits)
+        memory = sim.run(transpiled_qc, shots=max_attempts, memory=True).result().get_memory()
 
-    cbits = ClassicalRegister(len(output_qrs) * output_qrs[0].size, name='cbits')
+    if metrics is not None:
+        start_time = _lap(metrics, 'simulate', start_time)
+        metrics.count('shots', len(memory))
 
-    circuit.add_register(cbits)
+    feasible = False
+    output_assignments = None
+    distribution = {}
+    checked = {}
 
-    circuit.measure(flatten([qubits for qubits in output_qrs]), cbits._bits)
+    # memory is the measured bit string of every shot in order
+    for value_str in memory:
+        if value_str not in checked:
+            assignments = decode_output_assignments(value_str, output_part_qr_mapping, output_size, output_qr_sizes=output_qr_sizes)
 
-    for _ in range(max_attempts):
-        transpiled_qc = transpile(circuit, sim)
-        qobj = assemble(transpiled_qc)
-        result = sim.run(qobj, shots=1).result()
+            # register values are local states of the searched output parts, the fixed output parts keep their state
+            if fixed_assignments is not None:
+                local_assignments = assignments
+                assignments = fixed_assignments.copy()
+                for o_i, local_states in zip(output_part_qr_mapping, output_local_states):
+                    assignments[o_i] = local_states[local_assignments[o_i]]
 
-        counts = result.get_counts()
-        value_str = list(counts.keys())[0]
+            # registers can encode more states than there are when the number of states is not a power of 2
+            checked[value_str] = assignments, bool(np.all(assignments < len(states))) and feasible_on_neighborhood_constraint(assignments, neighborhood_constraint, neighborhood, topology=topology)
 
-        # if hex string then convert to binary string
-        if 'x' in value_str:
-            value = int(value_str, 16)
-            value_str = ''.join(str(i) for i in to_binary(value, num_bits=8))
+        assignments, assignments_feasible = checked[value_str]
 
-        num_bits_per_state = int(len(value_str) / len(output_part_qr_mapping))
+        if output_assignments is None or (assignments_feasible and not feasible):
+            feasible, output_assignments = assignments_feasible, assignments
 
-        bit_group_iter = list(grouper(num_bits_per_state, value_str))
-        bit_group_iter = reversed(bit_group_iter)
+        if assignments_feasible:
+            if not return_distribution:
+                break
 
-        for oqr_i, bits in enumerate(bit_group_iter):
-            bit_str = ''.join(bits)
-            state = int(bit_str, 2)
+            key = tuple(assignments.reshape(-1))
+            distribution[key] = distribution.get(key, 0) + 1
 
-            output_assignments[output_part_qr_mapping[oqr_i]] = state
+    if metrics is not None:
+        _lap(metrics, 'decode', start_time)
+        metrics.count('unique_measurements', len(checked))
+        metrics.count('feasible_measurements', sum(1 for _, assignments_feasible in checked.values() if assignments_feasible))
 
-        feasible = feasible_on_neighborhood_constraint(output_assignments, neighborhood_constraint, neighborhood)
-        if feasible:
-            break
+    if return_distribution:
+        return feasible, output_assignments, distribution
 
     return feasible, output_assignments
 
+# classical propagation fixes the output parts with one possible state and classical_collapses output parts are collapsed classically
+# before grover search, which then only searches the remaining output parts with registers of ceil(log2(possible states)) qubits
+# returns the same as quantum_collapse_qc
+def quantum_collapse_hybrid(
+    states,
+    output_size: Tuple[int, ...],
+    neighborhood,
+    neighborhood_constraint,
+    classical_collapses=0,
+    num_iterations=1,
+    max_attempts=1,
+    sim=None,
+    return_distribution=False,
+    cache_dir=None,
+    synthesis='esop',
+    dechorence_selector=None,
+    collapse=BinaryCollapse(),
+    resource_limits=None,
+    engine='aer',
+    metrics=None,
+):
+    output_size = tuple(output_size)
+    topology = GridTopology(neighborhood, output_size)
+    allowed = np.asarray(neighborhood_constraint) == 1
+
+    # a state without an allowed neighbor state in a direction is not possible next to an in bounds neighbor in that direction
+    initial_output = np.ones((topology.size, len(states)), dtype=bool)
+    for n_i in range(len(neighborhood)):
+        initial_output[topology.neighbors[:, n_i] != OUT_OF_BOUNDS] &= np.any(allowed[:, n_i, :], axis=1)
+
+    _, _, output_domains = quantum_collapse(states, output_size, neighborhood, allowed, dechorence_selector=dechorence_selector, collapse=collapse, topology=topology,
+                                            initial_output=initial_output.reshape(output_size + (len(states),)), unpack_output=True, max_collapses=classical_collapses,
+                                            metrics=metrics)
+
+    return quantum_collapse_qc(states, output_size, neighborhood, neighborhood_constraint, num_iterations=num_iterations, max_attempts=max_attempts, sim=sim,
+                               return_distribution=return_distribution, cache_dir=cache_dir, synthesis=synthesis, output_domains=output_domains,
+                               resource_limits=resource_limits, engine=engine, metrics=metrics)
+
 def create_neighborhood(num_dimensions, neighborhood_type='manhattan_distance_1'):
     if neighborhood_type == 'manhattan_distance_1':
         neighborhood = tuple([0] * num_dimensions for _ in range(num_dimensions * 2))
@@ -140,29 +463,58 @@ def create_neighborhood(num_dimensions, neighborhood_type='manhattan_distance_1'
 
         return neighborhood
 
-def feasible_on_neighborhood_constraint(output_assignments, neighborhood_constraint, neighborhood):
-    indices = np.ndindex(output_assignments.shape)
+# checks every pair of assigned neighbors at once per neighborhood direction, unassigned (-1) output parts are ignored
+# the pairs of a direction are two slices of the grid shifted against each other by the neighbor vector, so no topology is built
+# (topology is accepted for compatibility and not needed)
+# output_assignments is an output grid or a batch of output grids (batch shape + output grid shape), a batch returns a boolean
+# array of the batch shape
+# with return_violations returns (feasible, violation map, number of violations) where the violation map (the shape of
+# output_assignments) counts the neighbors every output part violates the neighborhood constraint with
+def feasible_on_neighborhood_constraint(output_assignments, neighborhood_constraint, neighborhood, topology=None, return_violations=False):
+    output_assignments = np.asarray(output_assignments)
+    num_batch_dimensions = output_assignments.ndim - len(neighborhood[0])
+    batch_shape = output_assignments.shape[:num_batch_dimensions]
+
+    is_assigned = output_assignments != -1
+    # unassigned output parts look up state 0 and are masked out afterwards
+    states = np.where(is_assigned, output_assignments, 0)
+
+    violations = np.zeros(output_assignments.shape, dtype=np.intp)
 
-    for i in indices:
-        for i_n, n in enumerate(neighborhood):
-            state = output_assignments[i]
-            neighbor_index = np.array(i)+np.array(n)
+    for n_i, n in enumerate(neighborhood):
+        # output parts that have a neighbor in direction n and their neighbors
+        output_slices = (slice(None),) * num_batch_dimensions + tuple(slice(max(0, -o), size - max(0, o)) for o, size in zip(n, output_assignments.shape[num_batch_dimensions:]))
+        neighbor_slices = (slice(None),) * num_batch_dimensions + tuple(slice(max(0, o), size - max(0, -o)) for o, size in zip(n, output_assignments.shape[num_batch_dimensions:]))
 
-            if np.any(neighbor_index < 0) or np.any(neighbor_index > np.array(output_assignments.shape) - 1):
-                    continue
+        is_violated = neighborhood_constraint[states[output_slices], n_i, states[neighbor_slices]] == 0
+        is_violated &= is_assigned[output_slices] & is_assigned[neighbor_slices]
 
-            n_state = output_assignments[tuple(neighbor_index)]
+        violations[output_slices] += is_violated
 
-            # ignore if assignment has not been made on the state or its neighbor
-            if state == -1 or n_state == -1:
-                continue
+    num_violations = violations.reshape(batch_shape + (-1,)).sum(axis=-1)
+    feasible = num_violations == 0
 
-            if neighborhood_constraint[state, i_n, n_state] == 0:
-                return False
+    if len(batch_shape) == 0:
+        feasible, num_violations = bool(feasible), int(num_violations)
 
-    return True
+    if return_violations:
+        return feasible, violations, num_violations
+
+    return feasible
 
 # example: grouper(3, 'ABCDEFG', 'x') --> ABC DEF Gxx
 def grouper(n, iterable, fillvalue=None):
     args = [iter(iterable)] * n
     return zip_longest(fillvalue=fillvalue, *args)
+
+# the quantum computing functions (see qca.quantum_computing) stay available as attributes of qca but are only imported,
+# together with qiskit, when one of them is first used
+def __getattr__(name):
+    if not name.startswith('_'):
+        # importlib since from . import quantum_computing would look the module up with __getattr__ again
+        quantum_computing = importlib.import_module('.quantum_computing', __name__)
+
+        if hasattr(quantum_computing, name):
+            return getattr(quantum_computing, name)
+
+    raise AttributeError(f"module 'qca' has no attribute '{name}'")
@@ -0,0 +1,41 @@
+# registry of the quantum simulator backends, a backend is created by its factory the first time it is used so importing qca
+# (and classical runs) never import qiskit
+
+# raised before a circuit is built when its estimated resources exceed every simulation method's limits
+class ResourceLimitError(RuntimeError):
+    def __init__(self, message, estimate) -> None:
+        super().__init__(message)
+        self.estimate = estimate
+
+# aer simulation methods in the order they are tried by select_simulation_method
+SIMULATION_METHODS = ('statevector', 'matrix_product_state', 'extended_stabilizer')
+
+# backend used for quantum randomness and when no simulation method is picked
+DEFAULT_BACKEND = 'aer_simulator'
+
+_backend_factories = {}
+_backends = {}
+
+# factory is called without arguments the first time the backend name is used, registering a name again replaces its backend
+def register_backend(name, factory):
+    _backend_factories[name] = factory
+    _backends.pop(name, None)
+
+def get_backend(name=DEFAULT_BACKEND):
+    if name not in _backends:
+        if name not in _backend_factories:
+            raise ValueError(f'Invalid backend {name}')
+
+        _backends[name] = _backend_factories[name]()
+
+    return _backends[name]
+
+def _aer_backend_factory(name):
+    def factory():
+        from qiskit import Aer
+        return Aer.get_backend(name)
+
+    return factory
+
+for _name in [DEFAULT_BACKEND] + [f'{DEFAULT_BACKEND}_{method}' for method in SIMULATION_METHODS]:
+    register_backend(_name, _aer_backend_factory(_name))
@@ -0,0 +1,101 @@
+from typing import Tuple
+
+import numpy as np
+
+from ..topology import GridTopology, OUT_OF_BOUNDS
+
+# generates batch_size independent outputs at once, every step selects, collapses and propagates
+# all outputs of the batch with array operations
+# the number of possible states and entropy of an output part are only updated when propagation changes it, an output that runs
+# into a contradiction stops and keeps its partial state (the contradicting output part has no possible states)
+# returns (output_is_consistent, output_assignments, output) where the first axis of each is the batch
+def quantum_collapse_batch(
+    states,
+    output_size: Tuple[int, ...],
+    neighborhood,
+    adjacency_contraint,
+    batch_size,
+    rng=None,
+    topology=None,
+):
+    if topology is None:
+        topology = GridTopology(neighborhood, output_size)
+    if rng is None:
+        rng = np.random.default_rng()
+
+    num_states = len(states)
+    output = np.ones((batch_size, topology.size, num_states), dtype=bool)
+    output_is_consistent = np.ones(batch_size, dtype=bool)
+
+    # supported neighbor states of every state in every direction, flattened so one matmul covers all directions
+    adjacency_contraint = (np.asarray(adjacency_contraint) == 1).astype(np.float32).reshape(num_states, len(neighborhood) * num_states)
+
+    # lowest entropy selection, random noise below 1 breaks ties between equal numbers of possible states
+    # output parts with at most one possible state have an infinite entropy and are never selected
+    noise = rng.random((batch_size, topology.size))
+    entropies = np.full((batch_size, topology.size), np.inf) if num_states <= 1 else num_states + noise
+
+    batch_indexes = np.arange(batch_size)
+
+    while True:
+        collapsing = np.argmin(entropies, axis=1)
+
+        active = output_is_consistent & np.isfinite(entropies[batch_indexes, collapsing])
+        if not active.any():
+            break
+
+        active_indexes = batch_indexes[active]
+        collapsing = collapsing[active]
+
+        # collapse to a uniformly random possible state, the largest random weight among the possible states
+        weights = np.where(output[active_indexes, collapsing], rng.random((len(active_indexes), num_states)), -1)
+        collapse_states = np.argmax(weights, axis=1)
+
+        output[active_indexes, collapsing] = False
+        output[active_indexes, collapsing, collapse_states] = True
+        entropies[active_indexes, collapsing] = np.inf
+
+        # propagate from the updated output parts of every output in the batch until nothing changes
+        updated_batch_indexes, updated_indexes = active_indexes, collapsing
+        while len(updated_batch_indexes) > 0:
+            supported_states = (output[updated_batch_indexes, updated_indexes].astype(np.float32) @ adjacency_contraint).reshape(-1, len(neighborhood), num_states) > 0
+
+            next_batch_indexes = []
+            next_indexes = []
+            for n_i in range(len(neighborhood)):
+                neighbor_indexes = topology.neighbors[updated_indexes, n_i]
+                in_bounds = neighbor_indexes != OUT_OF_BOUNDS
+
+                batch_in_bounds = updated_batch_indexes[in_bounds]
+                neighbor_indexes = neighbor_indexes[in_bounds]
+
+                # a neighborhood direction maps different output parts to different neighbors so the pairs are unique
+                neighbor_possible_states = output[batch_in_bounds, neighbor_indexes]
+                updated_possible_states = neighbor_possible_states & supported_states[in_bounds, n_i]
+                changed = np.any(updated_possible_states != neighbor_possible_states, axis=1)
+
+                batch_in_bounds, neighbor_indexes, updated_possible_states = batch_in_bounds[changed], neighbor_indexes[changed], updated_possible_states[changed]
+                output[batch_in_bounds, neighbor_indexes] = updated_possible_states
+
+                num_possible_states = updated_possible_states.sum(axis=1)
+                entropies[batch_in_bounds, neighbor_indexes] = np.where(num_possible_states > 1, num_possible_states + noise[batch_in_bounds, neighbor_indexes], np.inf)
+                output_is_consistent[batch_in_bounds[num_possible_states == 0]] = False
+
+                next_batch_indexes.append(batch_in_bounds)
+                next_indexes.append(neighbor_indexes)
+
+            next_batch_indexes, next_indexes = np.concatenate(next_batch_indexes), np.concatenate(next_indexes)
+
+            # outputs with a contradiction stop propagating
+            still_consistent = output_is_consistent[next_batch_indexes]
+            next_batch_indexes, next_indexes = next_batch_indexes[still_consistent], next_indexes[still_consistent]
+
+            # an output part can be updated from several directions, propagate from it once
+            next_updates = np.unique(np.stack([next_batch_indexes, next_indexes]), axis=1)
+            updated_batch_indexes, updated_indexes = next_updates[0], next_updates[1]
+
+    output_curr_num_possible_states = output.sum(axis=-1)
+    output_assignments = np.where(output_curr_num_possible_states == 1, np.argmax(output, axis=-1), -1)
+    output_is_consistent &= np.all(output_curr_num_possible_states == 1, axis=1)
+
+    return output_is_consistent, output_assignments.reshape((batch_size,) + tuple(output_size)), output.reshape((batch_size,) + tuple(output_size) + (num_states,))
@@ -0,0 +1,34 @@
+import os
+import threading
+from collections import OrderedDict
+
+# writes a file through a temporary file, write is called with the open binary file, so concurrent runs and threads never
+# read a partial file
+def write_atomic(file_path, write):
+    temp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_path, 'wb') as file:
+            write(file)
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# dict that keeps at most maxsize items, getting or setting an item makes it the most recently used and the least recently
+# used item is dropped when it is full
+class LRUCache(OrderedDict):
+    def __init__(self, maxsize=128) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
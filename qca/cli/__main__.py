@@ -1,24 +1,36 @@
 import argparse
 import builtins
-import math
 import os
+import sys
 import time
 
-import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
-from qca import create_neighborhood, quantum_collapse, quantum_collapse_qc
+from qca import create_neighborhood, quantum_collapse, quantum_collapse_hybrid, quantum_collapse_qc
+from qca.backends import ResourceLimitError
 from qca.collapse import BinaryCollapse
-from qca.decoherence import LowestEntropyDechorence
-from qca.input import create_patches, create_adjacency_matrix, parse_input, save_output
+from qca.decoherence import PriorityEntropyDechorence
+from qca.input import create_patches, create_adjacency_matrix, parse_input_directory, save_output, unique_patches
+from qca.parallel import quantum_collapse_parallel
+from qca.tiled import quantum_collapse_tiled
 
 parser = argparse.ArgumentParser()
 
-parser.add_argument('--input', '-i', type=str, required=True, help='A local file path, file directory, or a url')
-parser.add_argument('--patch_size', '--patchsize', type=lambda s: tuple(map(int, s.split(','))), required=True, help='CSV of numbers that specifies size of input parts. Dimension must match input dimension')
+# python -m qca.cli compile precompiles the ruleset of an input into a ruleset directory, see qca.ruleset
+# without a command the output is generated and the arguments below are required
+commands = parser.add_subparsers(dest='command', metavar='{compile}')
 
-parser.add_argument('--output_size', '--outputsize', type=lambda s: tuple(map(int, s.split(','))), required=True, help='Size out the output. Dimension must match the input dimension')
-parser.add_argument('--output_file', '--f', type=str, required=True, help='Output file where generated output will be saved')
+compile_parser = commands.add_parser('compile', help='Compiles the ruleset of an input into a ruleset directory')
+compile_parser.add_argument('--input', '-i', type=str, required=True, help='A local file path, file directory, or a url')
+compile_parser.add_argument('--patch_size', '--patchsize', type=lambda s: tuple(map(int, s.split(','))), required=True, help='CSV of numbers that specifies size of input parts. Dimension must match input dimension')
+compile_parser.add_argument('--ruleset_dir', type=str, required=True, help='Directory where compiled rulesets are saved')
+compile_parser.add_argument('--input_cache_dir', type=str, required=False, help='Directory where decoded input files and downloaded urls are cached between runs')
+
+parser.add_argument('--input', '-i', type=str, help='A local file path, file directory, or a url. Required without a command')
+parser.add_argument('--patch_size', '--patchsize', type=lambda s: tuple(map(int, s.split(','))), help='CSV of numbers that specifies size of input parts. Dimension must match input dimension. Required without a command')
+
+parser.add_argument('--output_size', '--outputsize', type=lambda s: tuple(map(int, s.split(','))), help='Size out the output. Dimension must match the input dimension. Required without a command')
+parser.add_argument('--output_file', '--f', type=str, help='Output file where generated output will be saved. Required without a command')
 
 algorithm_mode_group = parser.add_mutually_exclusive_group(required=False)
 
@@ -26,30 +38,79 @@ algorithm_mode_group.add_argument('--quantum_compute', '--qc', required=False, a
 
 algorithm_mode_group.add_argument('--quantum_randomness', '--qr', required=False, action='store_true', help='This flags enables using quantum randomness through quantum computing')
 
+parser.add_argument('--backtrack_limit', type=int, default=0, required=False, help='Number of contradictions the classical algorithm may undo by backtracking before giving up')
+
+parser.add_argument('--workers', type=int, default=1, required=False, help='Number of processes running classical attempts in parallel. 0 uses every cpu')
+
+parser.add_argument('--attempts', type=int, default=1, required=False, help='Maximum number of independent classical attempts. The first consistent output is saved')
+
+parser.add_argument('--attempt_seed', type=int, required=False, help='Replays the single classical attempt of a seed printed by an earlier run with --workers or --attempts')
+
+parser.add_argument('--tile_size', '--tilesize', type=lambda s: tuple(map(int, s.split(','))), required=False, help='CSV of numbers. Generates the classical output in tiles of this size to bound memory, a large png output image is written in strips')
+
+parser.add_argument('--assignments_file', type=str, required=False, help='.npy file the assignments of a tiled output are memory-mapped to')
+
+parser.add_argument('--input_cache_dir', type=str, required=False, help='Directory where decoded input files and downloaded urls are cached between runs')
+
+parser.add_argument('--ruleset_dir', type=str, required=False, help='Directory of compiled rulesets. The patches and neighborhood matrix of the input are loaded from it or compiled and saved to it')
+
+parser.add_argument('--cache_dir', type=str, required=False, help='Directory where built quantum circuits are cached between runs')
+
+parser.add_argument('--oracle_synthesis', type=str, default='esop', choices=['minterm', 'esop'], required=False, help='How the quantum computing oracle is synthesized. esop merges allowed state pairs into fewer multi-controlled gates')
+
+parser.add_argument('--hybrid', required=False, action='store_true', help='With --quantum_compute, output parts fixed by classical propagation are left out of the Grover\'s Search circuit')
+
+parser.add_argument('--classical_collapses', type=int, default=0, required=False, help='With --hybrid, number of output parts collapsed classically before Grover\'s Search')
+
+parser.add_argument('--max_memory', type=float, default=4, required=False, help='GiB a quantum computing statevector simulation may use. Larger circuits use the matrix product state or extended stabilizer simulation method or are refused')
+
+parser.add_argument('--engine', type=str, default='aer', choices=['aer', 'numpy'], required=False, help='Engine that runs the quantum computing Grover\'s Search. numpy simulates only the output qubits without the oracle ancilla qubits')
+
+parser.add_argument('--profile', type=str, required=False, help='JSON file a report of the counters and wall time of every phase of the run is saved to')
+
 parser.add_argument('--verbose', '-v', action='count', default=0, required=False, help='Incremental verbose parameter. -v prints steps and elapsed time. -vv saves debug figures ')
 
 args = parser.parse_args()
 
+if args.command == 'compile':
+    from qca.ruleset import get_ruleset
+
+    start_time = time.time()
+    ruleset, key = get_ruleset(args.input, args.patch_size, create_neighborhood(num_dimensions=len(args.patch_size)), args.ruleset_dir, input_cache_dir=args.input_cache_dir)
+    builtins.print(f'{len(ruleset.atlas)} unique states compiled to {os.path.join(args.ruleset_dir, "ruleset_" + key)} ({time.time() - start_time:.4f} s)')
+
+    sys.exit(0)
+
+# the generation arguments are only required without a command, so they are checked here instead of by argparse
+missing_arguments = [option for option, value in [('--input', args.input), ('--patch_size', args.patch_size), ('--output_size', args.output_size), ('--output_file', args.output_file)] if value is None]
+if len(missing_arguments) > 0:
+    parser.error(f'the following arguments are required: {", ".join(missing_arguments)}')
+
 # print function will only print when verbose is set above zero
 print = lambda *values: builtins.print(*values) if args.verbose > 0 else None
 
-if os.path.isdir(args.input):
-    input_type = None
+ruleset = None
 
-    files = [os.path.join(args.input, f) for f in os.listdir(args.input)]
-    patches = np.zeros((len(files)), dtype=object)
+if args.ruleset_dir is not None:
+    from qca.ruleset import get_ruleset
 
-    for i, full_path in enumerate(files):
-        input, input_type_i = parse_input(full_path)
-        if input_type == None:
-            input_type = input_type_i
-        if input_type_i != input_type:
-            raise ValueError('Folder contains more than one type of input')
-        patches[i] = input
+    # the compiled ruleset already has the unique patches and their neighborhood matrix
+    start_time = time.time()
+    ruleset, ruleset_key = get_ruleset(args.input, args.patch_size, create_neighborhood(num_dimensions=len(args.patch_size)), args.ruleset_dir, input_cache_dir=args.input_cache_dir)
+    patches, input_type, num_patches = ruleset.patches, ruleset.input_type, ruleset.patch_states.size
+    print(f'ruleset {ruleset_key} loaded ({time.time() - start_time:.4f} s)')
+elif os.path.isdir(args.input):
+    # every file is a patch, the files are decoded in parallel threads
+    patches, input_type = parse_input_directory(args.input, cache_dir=args.input_cache_dir)
 else:
-    patches, input, input_type = create_patches(input=args.input, patch_size=args.patch_size)
+    patches, input, input_type = create_patches(input=args.input, patch_size=args.patch_size, cache_dir=args.input_cache_dir)
     patches = patches.flatten()
 
+if ruleset is None:
+    # identical patches are the same state
+    num_patches = len(patches)
+    patches, _, _ = unique_patches(patches)
+
 if input_type == 'image' and len(args.patch_size) != 2:
     raise ValueError('Input is an image. Patch size must only contain 2 values.')
 
@@ -57,6 +118,7 @@ if input_type == 'image' and len(args.output_size) != 2:
     raise ValueError('Input is an image. Output size must only contain 2 values.')
 
 print('input type: ' + input_type)
+print(f'{len(patches)} unique states from {num_patches} patches')
 
 if input_type == 'image':
     num_dimensions = 2
@@ -91,36 +153,99 @@ if args.verbose > 1:
 
         states_img.save('states.png')
 
+metrics = None
+if args.profile is not None:
+    from qca.metrics import Metrics
+    metrics = Metrics()
+    metrics.record('states', len(patches))
+    metrics.record('output_size', list(args.output_size))
+
 start_time = time.time()
-adjacency_matrix = create_adjacency_matrix(patches, neighborhood)
+adjacency_matrix = create_adjacency_matrix(patches, neighborhood) if ruleset is None else ruleset.adjacency_matrix
 
 print(f'neighborhood matrix created ({time.time() - start_time:.4f} s)')
 
-dechorence_selector = LowestEntropyDechorence()
-collapse = BinaryCollapse()
+if metrics is not None:
+    metrics.add_time('create_adjacency_matrix', time.time() - start_time)
+
+dechorence_selector = PriorityEntropyDechorence(metrics=metrics)
+collapse = BinaryCollapse(metrics=metrics)
+choice = None
 
 if args.quantum_randomness:
-    from qca.quantum_computing import choice
-    dechorence_selector = LowestEntropyDechorence(choice=choice)
-    collapse = BinaryCollapse(choice=choice)
+    from qca.quantum_computing import QuantumRandomnessPool
+
+    # one multi-shot simulator job serves many choices
+    randomness_pool = QuantumRandomnessPool()
+    choice = randomness_pool.choice
+    dechorence_selector = PriorityEntropyDechorence(choice=choice, metrics=metrics)
+    collapse = BinaryCollapse(choice=choice, metrics=metrics)
 
 start_time = time.time()
 if args.quantum_compute:
-    # define N as the state database size and M as the number of solutions
-    # let use assume there is at least 1 solution (this isn't always true)
-    # grovers algorithm expects to find a queried state after √(N/M)
-    N = math.prod(args.output_size)**len(patches)
-    M = 1
-    num_iterations = math.ceil(math.sqrt(N/M))
+    # N is the number of basis states of the output quantum registers and M the number of solutions among them, both are counted
+    # classically and grovers algorithm finds a solution with the highest probability after about π/4 √(N/M) iterations
+    # the hybrid search space depends on the classically fixed output parts so it is counted when the circuit is built
+    num_iterations = 'auto'
+    if not args.hybrid:
+        from qca.counting import grover_search_space, optimal_num_iterations
+        N, M = grover_search_space(args.output_size, neighborhood, adjacency_matrix)
+        num_iterations = optimal_num_iterations(N, M)
+        print(f'N: {N}, M: {M}')
     print('Iteration Count: ', num_iterations)
 
-    success, output = quantum_collapse_qc(patches, output_size=args.output_size, neighborhood_constraint=adjacency_matrix, neighborhood=neighborhood,
-                                          num_iterations=num_iterations)
+    # the hybrid circuit depends on the classically fixed output parts so it is only known when it is built
+    if args.verbose > 0 and not args.hybrid and args.engine == 'numpy':
+        # the numpy engine only simulates the output qubits, there are no oracle gates or ancilla qubits to estimate
+        from qca.quantum_computing import grover_search_layout
+        from qca.simulation import grover_memory
+        output_parts, _ = grover_search_layout(args.output_size, neighborhood, adjacency_matrix)
+        num_output_qubits = sum(num_qubits for _, _, num_qubits in output_parts)
+        print(f'output qubits: {num_output_qubits}, amplitudes: {2**num_output_qubits}, memory: {grover_memory(num_output_qubits) / 2**20:.1f} MiB')
+    elif args.verbose > 0 and not args.hybrid:
+        from qca.quantum_computing import estimate_quantum_collapse_resources
+        estimate = estimate_quantum_collapse_resources(args.output_size, neighborhood, adjacency_matrix, num_iterations=num_iterations, synthesis=args.oracle_synthesis)
+        num_minterm_mcts = estimate_quantum_collapse_resources(args.output_size, neighborhood, adjacency_matrix, num_iterations=num_iterations, synthesis='minterm')['mcts']
+        print(f"qubits: {estimate['qubits']}, MCTs: {estimate['mcts']} ({args.oracle_synthesis}), {num_minterm_mcts} (minterm), depth: {estimate['depth']}, statevector memory: {estimate['statevector_memory'] / 2**20:.1f} MiB")
+
+    resource_limits = {'max_statevector_memory': int(args.max_memory * 2**30)}
+
+    try:
+        if args.hybrid:
+            success, output = quantum_collapse_hybrid(patches, output_size=args.output_size, neighborhood_constraint=adjacency_matrix, neighborhood=neighborhood, classical_collapses=args.classical_collapses,
+                                                      num_iterations=num_iterations, cache_dir=args.cache_dir, synthesis=args.oracle_synthesis, resource_limits=resource_limits, engine=args.engine,
+                                                      dechorence_selector=dechorence_selector, collapse=collapse, metrics=metrics)
+        else:
+            success, output = quantum_collapse_qc(patches, output_size=args.output_size, neighborhood_constraint=adjacency_matrix, neighborhood=neighborhood,
+                                                  num_iterations=num_iterations, cache_dir=args.cache_dir, synthesis=args.oracle_synthesis, resource_limits=resource_limits, engine=args.engine, metrics=metrics)
+    except ResourceLimitError as error:
+        # the circuit is refused before it is built
+        estimate = ', '.join(f'{name}: {value}' for name, value in error.estimate.items())
+        parser.error(f'{error} (--max_memory {args.max_memory} GiB, estimate {estimate})')
+elif args.tile_size is not None:
+    success, output = quantum_collapse_tiled(patches, output_size=args.output_size, adjacency_contraint=adjacency_matrix, neighborhood=neighborhood, tile_size=args.tile_size,
+                                             assignments_path=args.assignments_file, backtrack_limit=args.backtrack_limit, dechorence_selector=dechorence_selector, collapse=collapse, metrics=metrics)
+elif args.workers != 1 or args.attempts > 1 or args.attempt_seed is not None:
+    success, output, seed = quantum_collapse_parallel(patches, output_size=args.output_size, adjacency_contraint=adjacency_matrix, neighborhood=neighborhood,
+                                                      workers=args.workers, attempts=args.attempts, backtrack_limit=args.backtrack_limit, choice=choice, attempt_seed=args.attempt_seed)
+    print(f'seed: {seed}')
 else:
     success, output, _ = quantum_collapse(patches, output_size=args.output_size, adjacency_contraint=adjacency_matrix, neighborhood=neighborhood,
-                                          dechorence_selector=dechorence_selector, collapse=collapse)
+                                          dechorence_selector=dechorence_selector, collapse=collapse, backtrack_limit=args.backtrack_limit, metrics=metrics)
 
 print(f'Done. success: {success} ({time.time() - start_time:.4f} s)')
 
+if metrics is not None:
+    metrics.add_time('total', time.time() - start_time)
+    metrics.record('success', bool(success))
+
+if args.quantum_randomness:
+    print(f'quantum randomness: {randomness_pool.hits} hits, {randomness_pool.misses} misses, {randomness_pool.refills} refills')
+
 if input_type == 'image':
-    save_output(args.output_file, output, patches, 'image')
\ No newline at end of file
+    # outputs too large to render as one image, like tiled ones, are streamed when output_file is a png
+    save_output(args.output_file, output, patches, 'image')
+if metrics is not None:
+    metrics.add_time('save_output', time.time() - start_time - metrics.timers['total'])
+    metrics.save(args.profile)
+    print(f'profile saved to {args.profile}')
@@ -1,26 +1,32 @@
 from typing import Any
 
-import numpy as np
 import numpy.random as random
 
+from ..domain import domain_states, state_domain
+
+# metrics (see qca.metrics) optionally counts collapses and the possible states they chose from
 class BinaryCollapse():
-    def __init__(self, choice=random.choice) -> None:
+    def __init__(self, choice=random.choice, metrics=None) -> None:
         self.choice = choice
+        self.metrics = metrics
 
     def __call__(self, *args: Any, **kwds: Any) -> Any:
         return self.collapse(*args, **kwds)
     
+    # output holds the packed possible states of every output part (see qca.domain)
     def collapse(self, index, output, output_curr_num_possible_states, output_assignments):
         output_curr_num_possible_states[index] = 1
         
-        indices = np.where(output[index] == 1)[0]
+        indices = domain_states(output[index])
+
+        if self.metrics is not None:
+            self.metrics.count('collapses')
+            self.metrics.count('collapse_candidates', len(indices))
 
         collapse_index = self.choice(indices)
 
-        collapse_value = np.zeros(output.shape[-1])
-        collapse_value[collapse_index] = 1
-        output[index] = collapse_value
+        output[index] = state_domain(collapse_index, output.shape[-1])
 
         output_assignments[index] = collapse_index
 
-        return index, collapse_index
\ No newline at end of file
+        return index, collapse_index
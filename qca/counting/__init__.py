@@ -0,0 +1,211 @@
+import math
+from typing import Tuple
+
+import numpy as np
+
+from ..topology import GridTopology, OUT_OF_BOUNDS
+
+# counts the feasible output assignments (see feasible_on_neighborhood_constraint) of a grid
+
+# (within row pairs, down pairs, up pairs) of (cell, neighborhood index, neighbor cell) where cells are flat indexes within a row
+# down pairs have the neighbor in the next row and up pairs are cells of the next row with the neighbor in the row before
+def _row_pairs(output_size, neighborhood):
+    row_size = int(np.prod(output_size[1:], dtype=int))
+    topology = GridTopology(neighborhood, (min(output_size[0], 2),) + tuple(output_size[1:]))
+
+    within_row_pairs, down_pairs, up_pairs = [], [], []
+    for flat_index, n_i, neighbor_flat_index in topology.edges():
+        row, cell = divmod(flat_index, row_size)
+        neighbor_row, neighbor_cell = divmod(neighbor_flat_index, row_size)
+
+        if row == neighbor_row:
+            if row == 0:
+                within_row_pairs.append((cell, n_i, neighbor_cell))
+        elif row == 0:
+            down_pairs.append((cell, n_i, neighbor_cell))
+        else:
+            up_pairs.append((cell, n_i, neighbor_cell))
+
+    return within_row_pairs, down_pairs, up_pairs
+
+# (configurations, 1 row cells) states of every assignment of one row of possible states
+def _row_configurations(row_domains):
+    possible_states = [np.flatnonzero(domain) for domain in row_domains]
+    return np.stack(np.meshgrid(*possible_states, indexing='ij'), axis=-1).reshape(-1, len(possible_states))
+
+# exact count by dynamic programming over rows (the first axis), the vector of the number of solutions of the rows so far
+# ending in every row configuration is multiplied with the transfer matrix of allowed consecutive row configurations
+def _count_solutions_transfer_matrix(output_size, neighborhood, allowed, output_domains, weights):
+    within_row_pairs, down_pairs, up_pairs = _row_pairs(output_size, neighborhood)
+    row_size = int(np.prod(output_size[1:], dtype=int))
+
+    output_domains = output_domains.reshape(output_size[0], row_size, -1)
+    weights = weights.reshape(output_size[0], row_size, -1)
+
+    rows = []
+    upper_bound = 1
+    for row in range(output_size[0]):
+        # rows with the same possible states share their configurations so the transfer matrix is built once
+        if row > 0 and np.array_equal(output_domains[row], output_domains[row - 1]) and np.array_equal(weights[row], weights[row - 1]):
+            rows.append(rows[-1])
+            upper_bound *= max(1, int(rows[-1][1].sum()))
+            continue
+
+        configurations = _row_configurations(output_domains[row])
+
+        row_is_valid = np.ones(len(configurations), dtype=bool)
+        for cell, n_i, neighbor_cell in within_row_pairs:
+            row_is_valid &= allowed[configurations[:, cell], n_i, configurations[:, neighbor_cell]]
+
+        row_weights = np.prod(weights[row, np.arange(row_size), configurations], axis=1) * row_is_valid
+        upper_bound *= max(1, int(row_weights.sum()))
+
+        rows.append((configurations, row_weights))
+
+    # counts that can be larger than int64 are counted in floating point and are no longer exact
+    dtype = np.int64 if upper_bound < 2**62 else np.float64
+
+    configurations, row_weights = rows[0]
+    num_solutions = row_weights.astype(dtype)
+    transfer_matrix = None
+
+    for row in range(1, len(rows)):
+        next_configurations, next_row_weights = rows[row]
+
+        if transfer_matrix is None or rows[row] is not rows[row - 1] or rows[row - 1] is not rows[row - 2]:
+            transfer_matrix = np.ones((len(configurations), len(next_configurations)), dtype=bool)
+            for cell, n_i, neighbor_cell in down_pairs:
+                transfer_matrix &= allowed[configurations[:, cell][:, None], n_i, next_configurations[:, neighbor_cell][None, :]]
+            for cell, n_i, neighbor_cell in up_pairs:
+                transfer_matrix &= allowed[next_configurations[:, cell][None, :], n_i, configurations[:, neighbor_cell][:, None]]
+            transfer_matrix = transfer_matrix.astype(dtype)
+
+        num_solutions = (num_solutions @ transfer_matrix) * next_row_weights.astype(dtype)
+        configurations = next_configurations
+
+    if dtype == np.float64:
+        return float(num_solutions.sum()), False
+
+    return int(num_solutions.sum()), True
+
+# unbiased estimate (Knuth's estimator) from num_samples random assignments in flat order, every output part is assigned a
+# random state allowed by its assigned neighbors and a sample is weighted by the product of the number of states it could pick
+def _estimate_solutions(output_size, neighborhood, allowed, output_domains, weights, num_samples, rng):
+    topology = GridTopology(neighborhood, output_size)
+    output_domains = output_domains.reshape(topology.size, -1)
+    weights = weights.reshape(topology.size, -1)
+
+    # reverse_neighbors[flat_index, neighborhood index] is the output part that has flat_index as its neighbor in that direction
+    reverse_neighbors = np.full_like(topology.neighbors, OUT_OF_BOUNDS)
+    for flat_index, n_i, neighbor_flat_index in topology.edges():
+        reverse_neighbors[neighbor_flat_index, n_i] = flat_index
+
+    assignments = np.full((num_samples, topology.size), -1, dtype=np.intp)
+    sample_weights = np.ones(num_samples)
+
+    for flat_index in range(topology.size):
+        possible_states = np.repeat(output_domains[flat_index][None, :], num_samples, axis=0)
+
+        for n_i in range(len(neighborhood)):
+            neighbor_flat_index = topology.neighbors[flat_index, n_i]
+            if neighbor_flat_index != OUT_OF_BOUNDS and neighbor_flat_index < flat_index:
+                possible_states &= allowed[:, n_i, assignments[:, neighbor_flat_index]].T
+
+            neighbor_flat_index = reverse_neighbors[flat_index, n_i]
+            if neighbor_flat_index != OUT_OF_BOUNDS and neighbor_flat_index < flat_index:
+                possible_states &= allowed[assignments[:, neighbor_flat_index], n_i, :]
+
+        num_possible_states = possible_states.sum(axis=1)
+        sample_weights *= num_possible_states
+
+        # samples without possible states keep a weight of 0 and any state so the next output parts can be checked
+        picks = np.argmax(np.where(possible_states, rng.random(possible_states.shape), -1), axis=1)
+        assignments[:, flat_index] = picks
+        sample_weights *= weights[flat_index, picks]
+
+    return float(sample_weights.mean())
+
+# returns (number of solutions, exact) where the number of solutions is an int when it is exact and a float otherwise
+# output_domains (output_size + (num_states,)) optionally restricts the possible states of the output parts
+# weights (output_size + (num_states,)) optionally counts a solution as the product of the weights of its states
+# the count is exact when every neighbor is at most one row (first axis) away and every row has at most max_row_configurations
+# assignments and the count fits in int64, otherwise it is computed in floating point or estimated from num_samples random samples
+def count_solutions(
+    output_size: Tuple[int, ...],
+    neighborhood,
+    neighborhood_constraint,
+    output_domains=None,
+    weights=None,
+    max_row_configurations=4096,
+    num_samples=1000,
+    rng=None,
+):
+    output_size = tuple(output_size)
+    allowed = np.asarray(neighborhood_constraint) == 1
+    num_states = allowed.shape[0]
+
+    if output_domains is None:
+        output_domains = np.ones(output_size + (num_states,), dtype=bool)
+    output_domains = np.asarray(output_domains, dtype=bool)
+
+    if weights is None:
+        weights = np.ones(output_size + (num_states,), dtype=np.int64)
+    weights = np.asarray(weights)
+
+    if not np.all(output_domains.any(axis=-1)):
+        return 0, True
+
+    num_row_configurations = np.prod(output_domains.sum(axis=-1).reshape(output_size[0], -1), axis=1, dtype=float)
+
+    if all(abs(n[0]) <= 1 for n in neighborhood) and np.all(num_row_configurations <= max_row_configurations):
+        return _count_solutions_transfer_matrix(output_size, neighborhood, allowed, output_domains, weights)
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    return _estimate_solutions(output_size, neighborhood, allowed, output_domains, weights, num_samples, rng), False
+
+# optimal number of grover iterations to find one of num_solutions marked states in a search space of search_space_size states,
+# floor(pi / (4 theta)) with sin(theta)^2 = M / N which is floor(pi / 4 * sqrt(N / M)) when there are few solutions
+def optimal_num_iterations(search_space_size, num_solutions):
+    if num_solutions <= 0:
+        return 0
+
+    ratio = num_solutions / search_space_size
+    if ratio > 0:
+        return math.floor(math.pi / (4 * math.asin(math.sqrt(min(ratio, 1)))))
+
+    # the ratio underflows for very large search spaces
+    return math.floor(math.pi / 4 * math.isqrt(search_space_size // max(1, int(num_solutions))))
+
+# (search space size, number of marked states) of the quantum collapse grover search, every output part has a register of
+# ceil(log2(num_states)) qubits, with output_domains (see quantum_collapse_qc) the output parts with one possible state are left out
+# and register value k of the others is the k-th possible state wrapping around so a state is marked once per value that encodes it
+def grover_search_space(output_size, neighborhood, neighborhood_constraint, output_domains=None, **kwargs):
+    output_size = tuple(output_size)
+    num_states = np.asarray(neighborhood_constraint).shape[0]
+
+    if output_domains is None:
+        num_qubits = math.ceil(math.log2(num_states)) * int(np.prod(output_size, dtype=int))
+        num_solutions, _ = count_solutions(output_size, neighborhood, neighborhood_constraint, **kwargs)
+        return 2**num_qubits, num_solutions
+
+    output_domains = np.asarray(output_domains, dtype=bool)
+    weights = np.ones(output_domains.shape, dtype=np.int64)
+    num_qubits = 0
+
+    for index in np.ndindex(output_size):
+        num_possible_states = int(output_domains[index].sum())
+        if num_possible_states <= 1:
+            continue
+
+        qubits = math.ceil(math.log2(num_possible_states))
+        num_qubits += qubits
+        weights[index][output_domains[index]] = np.bincount(np.arange(2**qubits) % num_possible_states, minlength=num_possible_states)
+
+    num_solutions, _ = count_solutions(output_size, neighborhood, neighborhood_constraint, output_domains=output_domains, weights=weights, **kwargs)
+
+    return 2**num_qubits, num_solutions
+
+def grover_num_iterations(output_size, neighborhood, neighborhood_constraint, output_domains=None, **kwargs):
+    return optimal_num_iterations(*grover_search_space(output_size, neighborhood, neighborhood_constraint, output_domains=output_domains, **kwargs))
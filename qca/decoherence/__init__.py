@@ -1,11 +1,14 @@
+import heapq
 import random
 from typing import Any
 
 import numpy as np
 
+# metrics (see qca.metrics) optionally counts selections and the lowest entropy output parts they chose from
 class LowestEntropyDechorence():
-    def __init__(self, choice=random.choice) -> None:
+    def __init__(self, choice=random.choice, metrics=None) -> None:
         self.choice = choice
+        self.metrics = metrics
 
     def __call__(self, *args: Any, **kwds: Any) -> Any:
         return self.select(*args, **kwds)
@@ -23,10 +26,114 @@ class LowestEntropyDechorence():
             elif output_curr_num_possible_states[i] == arg_min:
                 lowest_entropies.append(i)
 
+        if self.metrics is not None:
+            self.metrics.count('selections')
+            self.metrics.count('selection_candidates', len(lowest_entropies))
+
         if len(lowest_entropies) == 1:
             return lowest_entropies[0]
         else:
             if choose_random:
                 return self.choice(lowest_entropies)
             else:
-                raise Exception('Equal number of states')
\ No newline at end of file
+                raise Exception('Equal number of states')
+
+    # the full scan needs no bookkeeping between collapse steps
+    def reset(self, output_curr_num_possible_states, output_assignments):
+        pass
+
+    def update(self, flat_indexes, output_curr_num_possible_states, output_assignments):
+        pass
+
+class _IndexedSet():
+    # set with O(1) add, remove and random access so a member can be picked with choice
+    def __init__(self) -> None:
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        self.positions[item] = len(self.items)
+        self.items.append(item)
+
+    def remove(self, item):
+        position = self.positions.pop(item)
+        last = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last
+            self.positions[last] = position
+
+class PriorityEntropyDechorence():
+    def __init__(self, choice=random.choice, metrics=None) -> None:
+        self.choice = choice
+        self.metrics = metrics
+        self.shape = None
+
+    def __call__(self, *args: Any, **kwds: Any) -> Any:
+        return self.select(*args, **kwds)
+
+    # output parts are kept in buckets keyed by their number of possible states and a heap holds the
+    # bucket keys, so empty buckets are only dropped from the heap when they reach the top
+    def reset(self, output_curr_num_possible_states, output_assignments):
+        self.shape = output_curr_num_possible_states.shape
+        self.buckets = {}
+        self.bucket_heap = []
+        self.bucket_heap_keys = set()
+        self.output_part_buckets = np.zeros(output_curr_num_possible_states.size, dtype=int).tolist()
+
+        self.update(range(output_curr_num_possible_states.size), output_curr_num_possible_states, output_assignments)
+
+    # flat_indexes are the output parts whose number of possible states or assignment changed
+    def update(self, flat_indexes, output_curr_num_possible_states, output_assignments):
+        output_curr_num_possible_states = output_curr_num_possible_states.reshape(-1)
+        output_assignments = output_assignments.reshape(-1)
+
+        for i in flat_indexes:
+            # assigned and inconsistent output parts can not be selected (bucket 0)
+            num_possible_states = 0
+            if output_assignments[i] == -1:
+                num_possible_states = int(output_curr_num_possible_states[i])
+
+            previous_num_possible_states = self.output_part_buckets[i]
+            if num_possible_states == previous_num_possible_states:
+                continue
+
+            if previous_num_possible_states > 0:
+                self.buckets[previous_num_possible_states].remove(i)
+
+            if num_possible_states > 0:
+                bucket = self.buckets.get(num_possible_states)
+                if bucket is None:
+                    bucket = self.buckets[num_possible_states] = _IndexedSet()
+                if num_possible_states not in self.bucket_heap_keys:
+                    heapq.heappush(self.bucket_heap, num_possible_states)
+                    self.bucket_heap_keys.add(num_possible_states)
+                bucket.add(i)
+
+            self.output_part_buckets[i] = num_possible_states
+
+    def select(self, output, output_curr_num_possible_states, output_assignments, choose_random=True):
+        if self.shape != output_curr_num_possible_states.shape:
+            self.reset(output_curr_num_possible_states, output_assignments)
+
+        # drop empty buckets from the top of the heap
+        while len(self.bucket_heap) > 0 and len(self.buckets[self.bucket_heap[0]]) == 0:
+            self.bucket_heap_keys.discard(heapq.heappop(self.bucket_heap))
+
+        lowest_entropies = self.buckets[self.bucket_heap[0]].items
+
+        if self.metrics is not None:
+            self.metrics.count('selections')
+            self.metrics.count('selection_candidates', len(lowest_entropies))
+
+        if len(lowest_entropies) == 1:
+            flat_index = lowest_entropies[0]
+        else:
+            if choose_random:
+                flat_index = self.choice(lowest_entropies)
+            else:
+                raise Exception('Equal number of states')
+
+        return tuple(int(i) for i in np.unravel_index(flat_index, self.shape))
@@ -0,0 +1,46 @@
+import numpy as np
+
+# possible states of an output part (its domain) are packed into uint64 words, state s is bit s % 64 of word s // 64
+
+WORD_SIZE = 64
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def num_words(num_states):
+    return max(1, -(-num_states // WORD_SIZE))
+
+# packs a boolean array (..., num_states) into (..., num_words(num_states)) uint64 words
+def pack_domains(domains):
+    domains = np.asarray(domains, dtype=bool)
+    words = num_words(domains.shape[-1])
+
+    packed_bytes = np.packbits(domains, axis=-1, bitorder='little')
+    padded_bytes = np.zeros(domains.shape[:-1] + (words * 8,), dtype=np.uint8)
+    padded_bytes[..., :packed_bytes.shape[-1]] = packed_bytes
+
+    return padded_bytes.view('<u8').astype(np.uint64, copy=False)
+
+# unpacks (..., num_words) uint64 words into a boolean array (..., num_states)
+def unpack_domains(packed, num_states):
+    packed_bytes = np.ascontiguousarray(packed, dtype='<u8').view(np.uint8)
+    return np.unpackbits(packed_bytes, axis=-1, count=num_states, bitorder='little').astype(bool)
+
+# number of possible states of every packed domain (...,)
+def popcount(packed):
+    packed_bytes = np.ascontiguousarray(packed, dtype='<u8').view(np.uint8)
+    return _POPCOUNT_TABLE[packed_bytes].sum(axis=-1, dtype=int)
+
+# indexes of the possible states of one packed domain
+def domain_states(packed):
+    packed_bytes = np.ascontiguousarray(packed, dtype='<u8').view(np.uint8)
+    return np.flatnonzero(np.unpackbits(packed_bytes, bitorder='little'))
+
+# packed domain with only the given state possible
+def state_domain(state, words):
+    packed = np.zeros(words, dtype=np.uint64)
+    packed[state // WORD_SIZE] = np.uint64(1) << np.uint64(state % WORD_SIZE)
+    return packed
+
+# whether state is possible in a packed domain
+def has_state(packed, state):
+    return (int(packed[state // WORD_SIZE]) >> (state % WORD_SIZE)) & 1 == 1
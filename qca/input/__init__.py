@@ -1,83 +1,172 @@
+import hashlib
+import io
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple
 from urllib.request import urlopen
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from PIL import Image
 
-def parse_image(input: str):
-     if type(input) is str:
-        try:
-            # if the input str is a url to an image then try to download it
-            try:
-                input = urlopen(input)
-            except:
-                pass
-            return np.array(Image.open(input).convert('RGBA'))
-        except Exception as e:
-            raise e
-
-def parse_input(input: str):
+from ..cache import write_atomic
+
+# bytes of a local file path or a url, with cache_dir a url is downloaded once into it
+def read_input(input: str, cache_dir=None):
+    if os.path.exists(input):
+        with open(input, 'rb') as file:
+            return file.read()
+
+    cache_path = None if cache_dir is None else os.path.join(cache_dir, f'url_{hashlib.sha256(input.encode()).hexdigest()}')
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as file:
+            return file.read()
+
+    with urlopen(input) as response:
+        data = response.read()
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_atomic(cache_path, lambda file: file.write(data))
+
+    return data
+
+# input is a file path, a url or a binary file object
+# with cache_dir the decoded RGBA array of a path or url is cached as .npy named by the hash of its bytes so unchanged files are
+# not decoded again
+def parse_image(input: str, cache_dir=None):
+    if type(input) is not str:
+        return np.array(Image.open(input).convert('RGBA'))
+
+    data = read_input(input, cache_dir=cache_dir)
+    if cache_dir is None:
+        return np.array(Image.open(io.BytesIO(data)).convert('RGBA'))
+
+    cache_path = os.path.join(cache_dir, f'image_{hashlib.sha256(data).hexdigest()}.npy')
+    if os.path.exists(cache_path):
+        return np.load(cache_path)
+
+    image = np.array(Image.open(io.BytesIO(data)).convert('RGBA'))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    write_atomic(cache_path, lambda file: np.save(file, image))
+
+    return image
+
+def parse_input(input: str, cache_dir=None):
     for parser, input_type in [(parse_image, 'image')]:
         try:
-            return parser(input), input_type
+            return parser(input, cache_dir=cache_dir), input_type
         except:
             raise ValueError('Could not parse image')
 
+# every file of directory (in sorted order) is one patch, files are read and decoded by workers threads (None picks the number
+# of threads like ThreadPoolExecutor), cache_dir caches the decoded files (see parse_image)
+# returns the patches and input type
+def parse_input_directory(directory: str, cache_dir=None, workers=None):
+    files = [os.path.join(directory, f) for f in sorted(os.listdir(directory))]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        inputs = list(executor.map(lambda file_path: parse_input(file_path, cache_dir=cache_dir), files))
 
-def create_patches(input, patch_size: Tuple[int, ...]):
-    input, input_type = parse_input(input)
+    input_types = set(input_type for _, input_type in inputs)
+    if len(input_types) > 1:
+        raise ValueError('Folder contains more than one type of input')
+
+    patches = np.empty(len(inputs), dtype=object)
+    for i, (input, _) in enumerate(inputs):
+        patches[i] = input
+
+    return patches, input_types.pop() if inputs else None
+
+def create_patches(input, patch_size: Tuple[int, ...], cache_dir=None):
+    input, input_type = parse_input(input, cache_dir=cache_dir)
 
     patches_num_dimensions = None
     if input_type == 'image':
         patches_num_dimensions = 2
 
-    patches = np.zeros(tuple(input.shape[i] // patch_size[i] for i in range(patches_num_dimensions)), dtype=object)
-    
-    for index, _ in np.ndenumerate(patches):
-        patch_size = np.array(patch_size)
-        index = np.array(index)
+    patch_axes = tuple(range(patches_num_dimensions))
+
+    # every patch sized window of the input as a strided view, stepping by the patch size gives non overlapping patches
+    windows = sliding_window_view(input, patch_size, axis=patch_axes)
+    windows = windows[tuple(slice(None, None, patch_size[i]) for i in patch_axes)]
 
-        patch = None
+    # sliding_window_view puts the window axes last, move them back in front of the remaining input axes (e.g. color)
+    windows = np.moveaxis(windows, tuple(range(windows.ndim - patches_num_dimensions, windows.ndim)), tuple(range(patches_num_dimensions, 2 * patches_num_dimensions)))
 
-        # vector multiply index and patch size so we can index on the input
-        # create patch by iterively taking from the numpy array on each axis
-        for idx, i in np.ndenumerate(np.multiply(index, patch_size)):
-            if patch is None:
-                patch = np.take(input, range(int(i), int(i) + int(patch_size[idx[0]])), axis=idx[0])
-            else:
-                patch = np.take(patch, range(int(i), int(i) + int(patch_size[idx[0]])), axis=idx[0])
+    patches = np.empty(windows.shape[:patches_num_dimensions], dtype=object)
+
+    for index in np.ndindex(patches.shape):
+        patches[index] = windows[index]
 
-        patches[tuple(index)] = patch
-    
     return patches, input, input_type
 
+# collapse identical patches into unique states
+# returns the unique patches (in order of first occurrence), how often each occurs and the state index of every patch
+def unique_patches(patches):
+    states = []
+    state_indexes = {}
+    counts = []
+    patch_states = np.zeros(patches.shape, dtype=int)
+
+    for index, patch in np.ndenumerate(patches):
+        key = (patch.shape, patch.dtype.str, patch.tobytes())
+
+        state_index = state_indexes.get(key)
+        if state_index is None:
+            state_index = state_indexes[key] = len(states)
+            states.append(patch)
+            counts.append(0)
+
+        counts[state_index] += 1
+        patch_states[index] = state_index
+
+    unique = np.empty(len(states), dtype=object)
+    for state_index, state in enumerate(states):
+        unique[state_index] = state
+
+    return unique, np.array(counts, dtype=int), patch_states
+
+# hashable key of the first (position=0) or last (position=-1) slice of a patch along an axis
+def _boundary_key(patch, axis, position):
+    boundary = np.take(patch, [position % patch.shape[axis]], axis=axis)
+    return boundary.shape, boundary.dtype.str, boundary.tobytes()
+
 def create_adjacency_matrix(patches, neighborhood, type_='overlapping_boundaries'):
-    adjacency_matrix = np.zeros((patches.shape + (len(neighborhood),) + patches.shape))
-
-    for index1, patch1 in np.ndenumerate(patches):
-        for index2, patch2 in np.ndenumerate(patches):
-            if type_== 'overlapping_boundaries':
-                for n_idx, n in enumerate(neighborhood):
-                    # axis to get boundary
-                    try:
-                        axis = n.index(1)
-                        direction = 1
-                    except:
-                        axis = n.index(-1)
-                        direction = -1
-    
-                    # check if boundaries matched based on direction
-                    if direction == 1:
-                        overlaps = np.array_equal(np.take(patch1, [patch1.shape[axis]-1], axis=axis), np.take(patch2, [0], axis=axis))
-                    elif direction == -1:
-                        overlaps = np.array_equal(np.take(patch1, [0], axis=axis), np.take(patch2, [patch2.shape[axis]-1], axis=axis))
-
-                    adjacency_matrix[index1+(n_idx,)+index2] = int(overlaps)
-
-            else:
-                raise ValueError('invalid type_')
-
-    return adjacency_matrix
+    if type_ != 'overlapping_boundaries':
+        raise ValueError('invalid type_')
+
+    flat_patches = patches.reshape(-1)
+    adjacency_matrix = np.zeros((flat_patches.size, len(neighborhood), flat_patches.size), dtype=bool)
+
+    for n_idx, n in enumerate(neighborhood):
+        # axis to get boundary
+        try:
+            axis = n.index(1)
+            direction = 1
+        except:
+            axis = n.index(-1)
+            direction = -1
+
+        # boundaries must match based on direction
+        # direction 1: last slice of patch 1 equals first slice of patch 2
+        # direction -1: first slice of patch 1 equals last slice of patch 2
+        position_1, position_2 = (-1, 0) if direction == 1 else (0, -1)
+
+        # bucket patches by the hash of their boundary so only matching boundaries are paired
+        buckets = {}
+        for index2, patch2 in enumerate(flat_patches):
+            buckets.setdefault(_boundary_key(patch2, axis, position_2), []).append(index2)
+
+        for index1, patch1 in enumerate(flat_patches):
+            matching = buckets.get(_boundary_key(patch1, axis, position_1))
+            if matching is not None:
+                adjacency_matrix[index1, n_idx, matching] = True
+
+    return adjacency_matrix.reshape(patches.shape + (len(neighborhood),) + patches.shape)
 
 def create_neighborhood_constraint_from_example(states, example, neighborhood):
     neighborhood_constraint = np.zeros((len(states), len(neighborhood), len(states)))
@@ -95,12 +184,70 @@ def create_neighborhood_constraint_from_example(states, example, neighborhood):
 
     return neighborhood_constraint
 
-def save_output(file_path, output, patches, input_type):
+# the output image is rendered from the patch atlas in one indexing operation (see render_output_strips), unassigned (-1) output parts
+# are transparent, png outputs of more than max_pixels pixels are streamed as strips of at most max_pixels pixels
+# (see save_output_strips) instead of rendered as one image
+def save_output(file_path, output, patches, input_type, max_pixels=2**26):
     if input_type == 'image':
-        img = Image.new("RGBA", tuple(np.array(patches[0].shape[:2]) * np.array(output.shape)))
-
-        for r in range(output.shape[0]):
-            for c in range(output.shape[1]):
-                if output[r][c] != -1:
-                    img.paste(Image.fromarray(patches[output[r][c]]), (c*patches[0].shape[1], r*patches[0].shape[0], (c+1)*patches[0].shape[1], (r+1)*patches[0].shape[0]))
-        img.save(file_path)
\ No newline at end of file
+        output = np.asarray(output)
+        patch_height, patch_width = patches[0].shape[:2]
+        row_pixels = output.shape[1] * patch_height * patch_width
+
+        if output.shape[0] * row_pixels > max_pixels and file_path.lower().endswith('.png'):
+            save_output_strips(file_path, output, patches, input_type, strip_size=max(1, max_pixels // row_pixels))
+            return
+
+        Image.fromarray(next(render_output_strips(output, patches, strip_size=max(1, output.shape[0])))).save(file_path)
+
+# stacks the patches into one array with a transparent patch appended for unassigned (-1) output parts
+def create_patch_atlas(patches):
+    atlas = np.zeros((len(patches) + 1,) + patches[0].shape, dtype=patches[0].dtype)
+    for i, patch in enumerate(patches):
+        atlas[i] = patch
+    return atlas
+
+# yields horizontal image strips of strip_size output rows, only one strip is rendered at a time
+def render_output_strips(output, patches, strip_size=1):
+    atlas = create_patch_atlas(patches)
+    patch_height, patch_width = atlas.shape[1:3]
+
+    for r in range(0, output.shape[0], strip_size):
+        strip_assignments = np.asarray(output[r:r + strip_size])
+        strip_assignments = np.where(strip_assignments == -1, len(atlas) - 1, strip_assignments)
+
+        # (rows, columns, patch height, patch width, channels) -> (rows * patch height, columns * patch width, channels)
+        strip = atlas[strip_assignments].transpose(0, 2, 1, 3, 4)
+        yield strip.reshape((strip_assignments.shape[0] * patch_height, strip_assignments.shape[1] * patch_width) + atlas.shape[3:])
+
+def _write_png_chunk(file, chunk_type, data):
+    file.write(struct.pack('>I', len(data)))
+    file.write(chunk_type)
+    file.write(data)
+    file.write(struct.pack('>I', zlib.crc32(chunk_type + data)))
+
+# writes RGBA uint8 strips of shape (rows, width, 4) to a png file as they are produced
+def write_png_strips(file_path, width, height, strips):
+    compressor = zlib.compressobj()
+
+    with open(file_path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        # 8 bit depth, color type 6 (RGBA), default compression, filter and no interlace
+        _write_png_chunk(file, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+        for strip in strips:
+            # every scanline starts with filter type 0 (none)
+            scanlines = np.zeros((strip.shape[0], 1 + width * 4), dtype=np.uint8)
+            scanlines[:, 1:] = strip.reshape(strip.shape[0], -1)
+
+            data = compressor.compress(scanlines.tobytes())
+            if len(data) > 0:
+                _write_png_chunk(file, b'IDAT', data)
+
+        _write_png_chunk(file, b'IDAT', compressor.flush())
+        _write_png_chunk(file, b'IEND', b'')
+
+# saves the output without building the whole image in memory, strip_size output rows are rendered at a time
+def save_output_strips(file_path, output, patches, input_type, strip_size=1):
+    if input_type == 'image':
+        patch_height, patch_width = patches[0].shape[:2]
+        write_png_strips(file_path, output.shape[1] * patch_width, output.shape[0] * patch_height, render_output_strips(output, patches, strip_size=strip_size))
@@ -0,0 +1,28 @@
+import json
+
+# collects counters, wall times and values of a generation run, every function that takes metrics skips its bookkeeping
+# when metrics is None so runs without metrics have (close to) no overhead
+# subclasses can override count, add_time and record to stream the events somewhere else
+class Metrics():
+    def __init__(self) -> None:
+        self.counters = {}
+        self.timers = {}
+        self.values = {}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    # adds seconds of wall time to the phase name
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def record(self, name, value):
+        self.values[name] = value
+
+    def to_dict(self):
+        return {'counters': dict(self.counters), 'timers': dict(self.timers), 'values': dict(self.values)}
+
+    def save(self, file_path):
+        with open(file_path, 'w') as file:
+            # numpy scalars are saved as python numbers
+            json.dump(self.to_dict(), file, indent=2, default=lambda value: value.item() if hasattr(value, 'item') else str(value))
@@ -0,0 +1,113 @@
+import random
+from multiprocessing import Pool, shared_memory
+from typing import Tuple
+
+import numpy as np
+
+from .. import quantum_collapse
+from ..collapse import BinaryCollapse
+from ..decoherence import PriorityEntropyDechorence
+from ..topology import GridTopology
+
+# state of a worker process, set once by _init_worker
+_worker = {}
+
+def _init_worker(shared_memory_name, adjacency_shape, adjacency_dtype, *args):
+    # attach to the adjacency tensor of the parent process instead of receiving a pickled copy
+    adjacency_memory = shared_memory.SharedMemory(name=shared_memory_name)
+
+    _worker['adjacency_memory'] = adjacency_memory
+    _set_worker(np.ndarray(adjacency_shape, dtype=adjacency_dtype, buffer=adjacency_memory.buf), *args)
+
+def _set_worker(adjacency_contraint, num_states, output_size, neighborhood, backtrack_limit, choice):
+    _worker['adjacency_contraint'] = adjacency_contraint
+    _worker['num_states'] = num_states
+    _worker['output_size'] = output_size
+    _worker['neighborhood'] = neighborhood
+    _worker['topology'] = GridTopology(neighborhood, output_size)
+    _worker['backtrack_limit'] = backtrack_limit
+    _worker['choice'] = choice
+
+def _attempt(seed):
+    choice = _worker['choice']
+
+    if choice is None:
+        dechorence_selector = PriorityEntropyDechorence(choice=random.Random(seed).choice)
+        collapse = BinaryCollapse(choice=np.random.default_rng(seed).choice)
+    else:
+        dechorence_selector = PriorityEntropyDechorence(choice=choice)
+        collapse = BinaryCollapse(choice=choice)
+
+    output_is_consistent, output_assignments, _ = quantum_collapse(
+        range(_worker['num_states']),
+        _worker['output_size'],
+        _worker['neighborhood'],
+        _worker['adjacency_contraint'],
+        dechorence_selector=dechorence_selector,
+        collapse=collapse,
+        topology=_worker['topology'],
+        backtrack_limit=_worker['backtrack_limit'],
+    )
+
+    return output_is_consistent, output_assignments, seed
+
+# runs independent seeded quantum_collapse attempts and returns the first consistent one
+# workers is the number of processes (None or 0 is the cpu count) and attempts the maximum number of attempts
+# the attempt seeds are drawn from np.random.SeedSequence(seed), attempt_seed instead runs the single attempt of that seed
+# returns (output_is_consistent, output_assignments, attempt seed), passing the attempt seed as attempt_seed (with the same
+# arguments otherwise) replays the attempt
+def quantum_collapse_parallel(
+    states,
+    output_size: Tuple[int, ...],
+    neighborhood,
+    adjacency_contraint,
+    workers=None,
+    attempts=1,
+    seed=None,
+    backtrack_limit=0,
+    choice=None,
+    attempt_seed=None,
+):
+    if attempts < 1:
+        raise ValueError('attempts must be at least 1')
+
+    output_size = tuple(output_size)
+    workers = workers or None
+    adjacency_contraint = np.ascontiguousarray(np.asarray(adjacency_contraint) == 1)
+    if attempt_seed is None:
+        seeds = [int(s) for s in np.random.SeedSequence(seed).generate_state(attempts)]
+    else:
+        seeds = [int(attempt_seed)]
+    worker_args = (len(states), output_size, neighborhood, backtrack_limit, choice)
+
+    result = None
+
+    # a single worker runs the attempts in this process
+    if workers == 1:
+        _set_worker(adjacency_contraint, *worker_args)
+        try:
+            for s in seeds:
+                result = _attempt(s)
+                if result[0]:
+                    break
+        finally:
+            _worker.clear()
+
+        return result
+
+    adjacency_memory = shared_memory.SharedMemory(create=True, size=max(adjacency_contraint.nbytes, 1))
+    try:
+        np.ndarray(adjacency_contraint.shape, dtype=adjacency_contraint.dtype, buffer=adjacency_memory.buf)[...] = adjacency_contraint
+
+        initargs = (adjacency_memory.name, adjacency_contraint.shape, adjacency_contraint.dtype) + worker_args
+
+        # leaving the pool context terminates workers that are still running attempts
+        with Pool(processes=workers, initializer=_init_worker, initargs=initargs) as pool:
+            for result in pool.imap_unordered(_attempt, seeds):
+                if result[0]:
+                    break
+
+        return result
+    finally:
+        adjacency_memory.close()
+        adjacency_memory.unlink()
@@ -0,0 +1,150 @@
+from collections import deque
+from typing import Any
+
+import numpy as np
+
+from ..domain import domain_states, has_state, popcount, state_domain
+from ..topology import OUT_OF_BOUNDS
+
+# output holds the packed possible states of every output part and adjacency_contraint[state, neighborhood index]
+# the packed states a neighbor can take (see qca.domain)
+# metrics (see qca.metrics) optionally counts the propagation queue pops and removed states, they are counted in local
+# variables and added once per call
+
+class QueuePropagation():
+    def __call__(self, *args: Any, **kwds: Any) -> Any:
+        return self.propagate(*args, **kwds)
+
+    # reference implementation that checks every neighbor state against every state of the popped output part
+    # updated_indexes collects the flat indexes of output parts whose number of possible states changed
+    # trail collects (flat index, packed removed states) so the removals can be undone with undo_trail
+    def propagate(self, index, output, output_curr_num_possible_states, topology, adjacency_contraint, updated_indexes=None, trail=None, metrics=None):
+        output_is_consistent = True
+        propagation_queue = deque()
+        num_pops = 0
+        num_removed_states = 0
+
+        # index output parts by flat index so neighbors are integer lookups in the topology
+        output = output.reshape(topology.size, -1)
+        output_curr_num_possible_states = output_curr_num_possible_states.reshape(-1)
+
+        propagation_queue.append(topology.flat_index(index))
+
+        # propagate updates through output
+        while len(propagation_queue) > 0:
+            index = propagation_queue.pop()
+            num_pops += 1
+
+            for n_i, neighbor_index in enumerate(topology.neighbor_lists[index]):
+                # skip out of bounds indexes
+                if neighbor_index == OUT_OF_BOUNDS:
+                    continue
+
+                num_possible_states_before_update = output_curr_num_possible_states[neighbor_index]
+                removed_states = np.zeros(output.shape[-1], dtype=np.uint64)
+
+                for neighbor_state_idx in domain_states(output[neighbor_index]):
+                    # loop through output part that was popped to see if neighbor states are possible based on neighborhood constraint
+                    state_is_possible = False
+                    for state_index in domain_states(output[index]):
+                        if has_state(adjacency_contraint[state_index, n_i], neighbor_state_idx):
+                            state_is_possible = True
+                            break
+
+                    if not state_is_possible:
+                        removed_states |= state_domain(neighbor_state_idx, output.shape[-1])
+                        output_curr_num_possible_states[neighbor_index] -= 1
+                        num_removed_states += 1
+
+                output[neighbor_index] &= ~removed_states
+
+                if trail is not None and removed_states.any():
+                    trail.append((neighbor_index, removed_states))
+
+                if updated_indexes is not None and output_curr_num_possible_states[neighbor_index] != num_possible_states_before_update:
+                    updated_indexes.append(neighbor_index)
+
+                # possible states are zero so output is not inconsistent
+                if output_curr_num_possible_states[neighbor_index] == 0:
+                    output_is_consistent = False
+                # if number of possible states has changed then propagate
+                elif output_curr_num_possible_states[neighbor_index] - num_possible_states_before_update != 0:
+                    propagation_queue.append(neighbor_index)
+
+        if metrics is not None:
+            metrics.count('propagation_pops', num_pops)
+            metrics.count('removed_states', num_removed_states)
+
+        return output_is_consistent
+
+class BitsetPropagation():
+    def __call__(self, *args: Any, **kwds: Any) -> Any:
+        return self.propagate(*args, **kwds)
+
+    # the states a neighbor can still take are the union (bitwise or) of the adjacency words of the popped
+    # part's possible states, intersected (bitwise and) with the neighbor's possible states
+    def propagate(self, index, output, output_curr_num_possible_states, topology, adjacency_contraint, updated_indexes=None, trail=None, metrics=None):
+        output_is_consistent = True
+        propagation_queue = deque()
+        num_pops = 0
+        num_removed_states = 0
+
+        output = output.reshape(topology.size, -1)
+        output_curr_num_possible_states = output_curr_num_possible_states.reshape(-1)
+
+        propagation_queue.append(topology.flat_index(index))
+
+        while len(propagation_queue) > 0:
+            index = propagation_queue.pop()
+            num_pops += 1
+
+            # (neighborhood index, word) supported neighbor states in every direction
+            supported_states = np.bitwise_or.reduce(adjacency_contraint[domain_states(output[index])], axis=0)
+
+            for n_i, neighbor_index in enumerate(topology.neighbor_lists[index]):
+                # skip out of bounds indexes
+                if neighbor_index == OUT_OF_BOUNDS:
+                    continue
+
+                neighbor_possible_states = output[neighbor_index]
+                removed_states = neighbor_possible_states & ~supported_states[n_i]
+
+                if not removed_states.any():
+                    continue
+
+                num_removed_neighbor_states = popcount(removed_states)
+
+                output[neighbor_index] = neighbor_possible_states & supported_states[n_i]
+                output_curr_num_possible_states[neighbor_index] -= num_removed_neighbor_states
+                num_removed_states += num_removed_neighbor_states
+
+                if updated_indexes is not None:
+                    updated_indexes.append(neighbor_index)
+                if trail is not None:
+                    trail.append((neighbor_index, removed_states))
+
+                # possible states are zero so output is not inconsistent
+                if output_curr_num_possible_states[neighbor_index] == 0:
+                    output_is_consistent = False
+                else:
+                    propagation_queue.append(neighbor_index)
+
+        if metrics is not None:
+            metrics.count('propagation_pops', num_pops)
+            metrics.count('removed_states', num_removed_states)
+
+        return output_is_consistent
+
+# restore the states removed after the first trail_length entries of the trail
+def undo_trail(trail, trail_length, output, output_curr_num_possible_states, topology, updated_indexes=None):
+    output = output.reshape(topology.size, -1)
+    output_curr_num_possible_states = output_curr_num_possible_states.reshape(-1)
+
+    while len(trail) > trail_length:
+        flat_index, removed_states = trail.pop()
+
+        output[flat_index] |= removed_states
+        output_curr_num_possible_states[flat_index] += popcount(removed_states)
+
+        if updated_indexes is not None:
+            updated_indexes.append(flat_index)
@@ -1,9 +1,16 @@
+import hashlib
 import math
+import os
+import threading
+from collections import deque
 
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, Aer
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, qpy
 from qiskit.circuit import Instruction
 from qiskit.quantum_info import Statevector
 
+from ..backends import ResourceLimitError, SIMULATION_METHODS, get_backend
+from ..cache import LRUCache, write_atomic
+
 def build_random_integer_circuit(num_bits):
     q = QuantumRegister(num_bits, 'q')
     c = ClassicalRegister(num_bits, 'c')
@@ -24,7 +31,10 @@ def get_circuit_statevector(circuit: QuantumCircuit):
     state = Statevector.from_instruction(circuit)
     return state
 
-def choice(iter, sim=Aer.get_backend('aer_simulator')):
+def choice(iter, sim=None):
+    if sim is None:
+        sim = get_backend()
+
     num_states = len(iter)
 
     # iterable only has one possible state
@@ -48,6 +58,111 @@ def choice(iter, sim=Aer.get_backend('aer_simulator')):
 
     return iter[choice_index]
 
+# serves quantum random integers from buffers filled by one multi-shot job per bit width
+# a buffer is refilled in a background thread once it holds less than refill_fraction * shots integers
+# hits counts integers served from a buffer, misses integers that had to wait for a job and refills the jobs run
+class QuantumRandomnessPool():
+    def __init__(self, sim=None, shots=1024, refill_fraction=0.25) -> None:
+        self.sim = get_backend() if sim is None else sim
+        self.shots = shots
+        self.refill_fraction = refill_fraction
+
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+
+        self._init_buffers()
+
+    def __call__(self, iter):
+        return self.choice(iter)
+
+    def _init_buffers(self):
+        self._buffers = {}
+        self._refill_threads = {}
+        self._condition = threading.Condition()
+
+    # locks, threads and buffered integers are not shared with copies of the pool (e.g. in worker processes)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ['_buffers', '_refill_threads', '_condition']:
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_buffers()
+
+    def _run_random_integer_job(self, num_bits):
+        random_int_circuit = build_random_integer_circuit(num_bits=num_bits)
+        result = self.sim.run(random_int_circuit, shots=self.shots, memory=True).result()
+
+        # memory is the measured bit string of every shot
+        return [int(value, 2) for value in result.get_memory()]
+
+    # the thread that runs the job of num_bits is in _refill_threads until the job is done, threads waiting for an empty
+    # buffer are woken up even when the job fails
+    def _refill(self, num_bits):
+        try:
+            values = self._run_random_integer_job(num_bits)
+
+            with self._condition:
+                self._buffers[num_bits].extend(values)
+                self.refills += 1
+        finally:
+            with self._condition:
+                self._refill_threads.pop(num_bits, None)
+                self._condition.notify_all()
+
+    def random_integer(self, num_bits):
+        hit = True
+
+        while True:
+            with self._condition:
+                buffer = self._buffers.setdefault(num_bits, deque())
+
+                if len(buffer) > 0:
+                    value = buffer.popleft()
+
+                    if hit:
+                        self.hits += 1
+                    else:
+                        self.misses += 1
+
+                    if len(buffer) < self.refill_fraction * self.shots and num_bits not in self._refill_threads:
+                        refill_thread = threading.Thread(target=self._refill, args=(num_bits,), daemon=True)
+                        self._refill_threads[num_bits] = refill_thread
+                        refill_thread.start()
+
+                    return value
+
+                hit = False
+
+                # an empty buffer waits for the job that is already filling it instead of running another one
+                if num_bits in self._refill_threads:
+                    self._condition.wait()
+                    continue
+
+                self._refill_threads[num_bits] = threading.current_thread()
+
+            # no job is filling the buffer so this thread runs one and other threads wait for it
+            self._refill(num_bits)
+
+    # same interface as choice
+    def choice(self, iter):
+        num_states = len(iter)
+
+        # iterable only has one possible state
+        if num_states == 1:
+            return iter[0]
+
+        num_bits = int(math.log2(num_states - 1)) + 1
+        choice_index = -1
+
+        while choice_index < 0 or choice_index >= len(iter):
+            choice_index = self.random_integer(num_bits)
+
+        return iter[choice_index]
+
 def diffuser(nqubits):
     qc = QuantumCircuit(nqubits)
     # Apply transformation |s> -> |00..0> (H-gates)
@@ -56,10 +171,13 @@ def diffuser(nqubits):
     # Apply transformation |00..0> -> |11..1> (X-gates)
     for qubit in range(nqubits):
         qc.x(qubit)
-    # Do multi-controlled-Z gate
-    qc.h(nqubits-1)
-    qc.mct(list(range(nqubits-1)), nqubits-1)  # multi-controlled-toffoli
-    qc.h(nqubits-1)
+    # Do multi-controlled-Z gate, a single qubit has no controls
+    if nqubits == 1:
+        qc.z(0)
+    else:
+        qc.h(nqubits-1)
+        qc.mct(list(range(nqubits-1)), nqubits-1)  # multi-controlled-toffoli
+        qc.h(nqubits-1)
     # Apply transformation |11..1> -> |00..0>
     for qubit in range(nqubits):
         qc.x(qubit)
@@ -88,50 +206,63 @@ def to_binary(integer, num_bits, msb='first'):
 
 import numpy as np
 
+from ..topology import GridTopology
+
+# hash of which states are allowed as neighbors, used to key cached circuits
+def constraint_hash(neighborhood_constraint):
+    allowed = np.ascontiguousarray(np.asarray(neighborhood_constraint) == 1)
+    return hashlib.sha256(str(allowed.shape).encode() + allowed.tobytes()).hexdigest()
+
 # states is a list of states
 # neighborhood is a list where each element is a tuple with a size of the number of dimension in output minus 1
 # output of size d1 x ... x len(states)
 # output_mask of size d1 x ...
-def build_quantum_collapse_algorithm_circuit(states, neighborhood, output, output_mask=None):
+# output_num_states of size d1 x ... optionally gives the number of possible states of every output part, its quantum register
+# then has ceil(log2(output_num_states)) qubits instead of ceil(log2(len(states)))
+def build_quantum_collapse_algorithm_circuit(states, neighborhood, output, output_mask=None, topology=None, output_num_states=None):
     num_states = len(states)
 
     if num_states == 0:
         raise ValueError('states is empty')
 
+    if topology is None:
+        topology = GridTopology(neighborhood, output.shape[:-1])
+
     qubits_per_output_part = math.ceil(math.log2(num_states))
 
     # output_mask masks parts of the output to ignore
-    num_masked_output = 0 if output_mask is None else np.count_nonzero(output_mask == 0)
-    num_output_parts = (output.size // num_states) - num_masked_output
-
-    output_qrs = [QuantumRegister(qubits_per_output_part, f'output_{i} ') for i in range(num_output_parts)]
-    output_part_indexes = np.ndindex(output.shape[:-1])
+    output_qrs = []
     output_part_qr_mapping = []
+    # flat output index to quantum register index in output_qrs
+    output_part_qr_indexes = {}
 
     # populate output_part_qr_mapping where the index points to a quantum register in output_qrs and the value is the output index
-    for o_i in output_part_indexes:
+    for flat_index, o_i in enumerate(topology.indexes):
         # skip masked output parts
         if output_mask is not None and output_mask[o_i] == 0:
             continue
 
+        if output_num_states is not None:
+            qubits_per_output_part = math.ceil(math.log2(output_num_states[o_i]))
+
+        output_part_qr_indexes[flat_index] = len(output_part_qr_mapping)
         output_part_qr_mapping.append(o_i)
+        output_qrs.append(QuantumRegister(qubits_per_output_part, f'output_{len(output_qrs)} '))
 
     neighborhood_constraint_qrs = []
     neighborhood_constraint_output_mapping = []
 
-    for o_i, o in enumerate(output_part_qr_mapping):
-        for n_i, n in enumerate(neighborhood):
-            neighbor_index = np.array(o) + np.array(n)
-
-            if np.any(neighbor_index < 0) or np.any(neighbor_index > np.array(output.shape[:-1]) - 1):
-                    continue
+    for flat_index, n_i, neighbor_flat_index in topology.edges():
+        # skip masked output parts and masked neighbors
+        if flat_index not in output_part_qr_indexes or neighbor_flat_index not in output_part_qr_indexes:
+            continue
 
-            neighborhood_constraint_qr = QuantumRegister(1, f'neighborhood_constraint_{len(neighborhood_constraint_qrs)} ')
+        neighborhood_constraint_qr = QuantumRegister(1, f'neighborhood_constraint_{len(neighborhood_constraint_qrs)} ')
 
-            neighborhood_constraint_qrs.append(neighborhood_constraint_qr)
+        neighborhood_constraint_qrs.append(neighborhood_constraint_qr)
 
-            # (output part 1 quantum register, output part 2 quantum register, neighborhood index)
-            neighborhood_constraint_output_mapping.append((output_qrs[o_i], output_qrs[output_part_qr_mapping.index(tuple(neighbor_index))], n_i))
+        # (output part 1 quantum register, output part 2 quantum register, neighborhood index)
+        neighborhood_constraint_output_mapping.append((output_qrs[output_part_qr_indexes[flat_index]], output_qrs[output_part_qr_indexes[neighbor_flat_index]], n_i))
 
     feasible_qr = QuantumRegister(1, 'feasible')
 
@@ -182,7 +313,11 @@ def build_feasible_check_circuit(quantum_collapse_algorithm_circuit, neighborhoo
         for _ in range(len(quantum_collapse_algorithm_circuit.qubits) - (len(neighborhood_constraint_qrs) + 1)):
             quantum_collapse_algorithm_circuit.qubits.pop(0)
 
-    quantum_collapse_algorithm_circuit.mct(neighborhood_constraint_qrs, feasible_circuit)
+    # without neighborhood constraints between the searched output parts every assignment is feasible
+    if len(neighborhood_constraint_qrs) == 0:
+        quantum_collapse_algorithm_circuit.x(feasible_circuit)
+    else:
+        quantum_collapse_algorithm_circuit.mct(neighborhood_constraint_qrs, feasible_circuit)
 
     if to_gate:
         gate = quantum_collapse_algorithm_circuit.to_gate()
@@ -191,19 +326,140 @@ def build_feasible_check_circuit(quantum_collapse_algorithm_circuit, neighborhoo
 
     return quantum_collapse_algorithm_circuit
 
-def build_quantum_collapse_neighborhood_constraint(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, to_gate=False, clone_circuit=False):
+# synthesis modes of the neighborhood constraint
+# minterm: one multi-controlled toffoli per allowed (s1, s2) state pair
+# esop: allowed state pairs are merged into cubes (exclusive sum of products) so one multi-controlled toffoli covers several pairs
+ORACLE_SYNTHESIS_MODES = ('minterm', 'esop')
+
+# allowed (s1, s2) state pairs of a relation that can be encoded in the quantum registers
+def allowed_relation_pairs(relation, num_qubits_1, num_qubits_2):
+    allowed = np.argwhere(np.asarray(relation) == 1)
+    return allowed[(allowed[:, 0] < 2**num_qubits_1) & (allowed[:, 1] < 2**num_qubits_2)]
+
+# local state k of an output part restricted to domain (a boolean array of len(states)) is the k-th possible state
+# wrapping around, so every value of a register of num_qubits qubits is a possible state
+def local_domain_states(domain, num_qubits):
+    possible_states = np.flatnonzero(domain)
+    return possible_states[np.arange(2**num_qubits) % len(possible_states)]
+
+# (s1, s2) relation of every neighborhood constraint edge between local states of output parts restricted to
+# output_domains (d1 x ... x len(states)), relation[k1, k2] is C_n[local state k1, neighborhood index, local state k2]
+def local_neighborhood_constraints(C_n, output_domains, output_qrs, output_part_qr_mapping, neighborhood_constraint_output_mapping):
+    C_n = np.asarray(C_n) == 1
+    local_states = {output_qr.name: local_domain_states(output_domains[o_i], output_qr.size) for output_qr, o_i in zip(output_qrs, output_part_qr_mapping)}
+
+    return [C_n[local_states[output_qr_1.name], neighborhood_i][:, local_states[output_qr_2.name]]
+            for output_qr_1, output_qr_2, neighborhood_i in neighborhood_constraint_output_mapping]
+
+# (s1, s2) relation of the edge nc_qr_i, edge_constraints replaces the neighborhood constraint of every edge when it is given
+def _edge_relation(C_n, edge_constraints, nc_qr_i, neighborhood_i):
+    if edge_constraints is not None:
+        return np.asarray(edge_constraints[nc_qr_i]) == 1
+    return np.asarray(C_n)[:, neighborhood_i, :] == 1
+
+# cubes (value, mask) over the bits of s1 followed by the bits of s2, a cube matches when the bits in mask equal value
+# the exclusive or of all cubes is 1 exactly on the allowed state pairs
+def synthesize_esop_cubes(allowed_pairs, num_qubits_1, num_qubits_2):
+    full_mask = (1 << (num_qubits_1 + num_qubits_2)) - 1
+
+    # mask -> values of the cubes with that mask
+    cubes = {full_mask: {int(s1) | (int(s2) << num_qubits_1) for s1, s2 in allowed_pairs}}
+
+    merged = True
+    while merged:
+        merged = False
+
+        for mask in sorted(cubes, key=lambda m: -bin(m).count('1')):
+            values = cubes[mask]
+
+            for bit in range(num_qubits_1 + num_qubits_2):
+                if not mask & (1 << bit):
+                    continue
+
+                for value in sorted(values):
+                    partner = value ^ (1 << bit)
+                    if value not in values or partner not in values:
+                        continue
+
+                    # cubes that differ in one bit xor to one cube without that bit
+                    values.discard(value)
+                    values.discard(partner)
+
+                    merged_mask = mask & ~(1 << bit)
+                    merged_values = cubes.setdefault(merged_mask, set())
+
+                    # equal cubes cancel out in an exclusive sum
+                    merged_values ^= {value & merged_mask}
+                    merged = True
+
+    return [(value, mask) for mask, values in cubes.items() for value in sorted(values)]
+
+# cubes of the allowed state pairs of an edge relation, minterm synthesis has one cube with every bit in its mask per pair
+# the cubes only depend on the relation and register sizes so they are kept in cache (a dict) and shared between edges
+def _edge_cubes(cache, relation, num_qubits_1, num_qubits_2, synthesis):
+    key = (relation.tobytes(), relation.shape, num_qubits_1, num_qubits_2)
+    cubes = cache.get(key)
+
+    if cubes is None:
+        allowed_pairs = allowed_relation_pairs(relation, num_qubits_1, num_qubits_2)
+        if synthesis == 'esop':
+            cubes = synthesize_esop_cubes(allowed_pairs, num_qubits_1, num_qubits_2)
+        else:
+            full_mask = (1 << (num_qubits_1 + num_qubits_2)) - 1
+            cubes = [(int(s1) | (int(s2) << num_qubits_1), full_mask) for s1, s2 in allowed_pairs]
+        cache[key] = cubes
+
+    return cubes
+
+def build_neighbor_constraint_cube_circuit(quantum_collapse_algorithm_circuit, output_qr_1, output_qr_2, cube, neighborhood_constraint_circuit):
+    value, mask = cube
+    qubits = list(output_qr_1._bits) + list(output_qr_2._bits)
+
+    controls = [q for i, q in enumerate(qubits) if mask & (1 << i)]
+    negated = [q for i, q in enumerate(qubits) if mask & (1 << i) and not value & (1 << i)]
+
+    if len(controls) == 0:
+        quantum_collapse_algorithm_circuit.x(neighborhood_constraint_circuit)
+        return quantum_collapse_algorithm_circuit
+
+    if len(negated) > 0:
+        quantum_collapse_algorithm_circuit.x(negated)
+    quantum_collapse_algorithm_circuit.mct(controls, neighborhood_constraint_circuit)
+    if len(negated) > 0:
+        quantum_collapse_algorithm_circuit.x(negated)
+
+    return quantum_collapse_algorithm_circuit
+
+# number of multi-controlled toffolis of one neighborhood constraint (the oracle has the constraint twice plus the feasibility check)
+def count_neighborhood_constraint_mcts(C_n, neighborhood_constraint_output_mapping, synthesis='esop', edge_constraints=None):
+    num_mcts = 0
+    cubes = {}
+
+    for nc_qr_i, (output_qr_1, output_qr_2, neighborhood_i) in enumerate(neighborhood_constraint_output_mapping):
+        relation = _edge_relation(C_n, edge_constraints, nc_qr_i, neighborhood_i)
+        # a cube without controls is an x gate
+        num_mcts += sum(1 for _, mask in _edge_cubes(cubes, relation, output_qr_1.size, output_qr_2.size, synthesis) if mask != 0)
+
+    return num_mcts
+
+# edge_constraints optionally gives the (s1, s2) relation of every edge of neighborhood_constraint_output_mapping (see local_neighborhood_constraints)
+def build_quantum_collapse_neighborhood_constraint(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, to_gate=False, clone_circuit=False, synthesis='esop', edge_constraints=None):
+    if synthesis not in ORACLE_SYNTHESIS_MODES:
+        raise ValueError('Invalid oracle synthesis mode')
+
     if clone_circuit:
         quantum_collapse_algorithm_circuit = quantum_collapse_algorithm_circuit.copy()
 
         # remove all instructions
         quantum_collapse_algorithm_circuit.data = [d for d in quantum_collapse_algorithm_circuit.data if not isinstance(d[0], Instruction)]
 
+    cubes = {}
+
     for nc_qr_i, (output_qr_1, output_qr_2, neighborhood_i) in enumerate(neighborhood_constraint_output_mapping):
-        for s1 in range(C_n.shape[0]):
-            for n_i in range(C_n.shape[1]):
-                for s2 in range(C_n.shape[2]):
-                    if n_i == neighborhood_i and C_n[s1, n_i, s2] == 1:
-                        build_neighbor_constraint_circuit(quantum_collapse_algorithm_circuit, ((output_qr_1, s1), (output_qr_2, s2)), neighborhood_constraint_qrs[nc_qr_i], clone_circuit=False)
+        relation = _edge_relation(C_n, edge_constraints, nc_qr_i, neighborhood_i)
+
+        for cube in _edge_cubes(cubes, relation, output_qr_1.size, output_qr_2.size, synthesis):
+            build_neighbor_constraint_cube_circuit(quantum_collapse_algorithm_circuit, output_qr_1, output_qr_2, cube, neighborhood_constraint_qrs[nc_qr_i])
 
     if to_gate:
         gate = quantum_collapse_algorithm_circuit.to_gate()
@@ -212,16 +468,16 @@ def build_quantum_collapse_neighborhood_constraint(quantum_collapse_algorithm_ci
 
     return quantum_collapse_algorithm_circuit
 
-def build_quantum_collapse_oracle(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_output_mapping, neighborhood_constraint_qrs, to_gate=False):
+def build_quantum_collapse_oracle(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_output_mapping, neighborhood_constraint_qrs, to_gate=False, synthesis='esop', edge_constraints=None):
     quantum_collapse_algorithm_circuit = quantum_collapse_algorithm_circuit.copy()
 
     # remove all instructions
     quantum_collapse_algorithm_circuit.data = [d for d in quantum_collapse_algorithm_circuit.data if not isinstance(d[0], Instruction)]
 
-    build_quantum_collapse_neighborhood_constraint(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, clone_circuit=False)
+    build_quantum_collapse_neighborhood_constraint(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, clone_circuit=False, synthesis=synthesis, edge_constraints=edge_constraints)
     build_feasible_check_circuit(quantum_collapse_algorithm_circuit, neighborhood_constraint_qrs, clone_circuit=False)
     # uncompute
-    build_quantum_collapse_neighborhood_constraint(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, clone_circuit=False)
+    build_quantum_collapse_neighborhood_constraint(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, clone_circuit=False, synthesis=synthesis, edge_constraints=edge_constraints)
 
     if to_gate:
         gate = quantum_collapse_algorithm_circuit.to_gate()
@@ -234,16 +490,10 @@ def flatten(t):
         return [item for sublist in t for item in sublist]
 
 def build_quantum_collapse_diffuser(quantum_collapse_algorithm_circuit, output_qrs, neighborhood_constraint_qrs, to_gate=False):
-    quantum_collapse_algorithm_circuit = quantum_collapse_algorithm_circuit.copy()
+    # the diffuser only acts on the output quantum registers, a circuit of just those registers can be serialized with qpy
+    quantum_collapse_algorithm_circuit = QuantumCircuit(*output_qrs)
 
-    # remove all instructions
-    quantum_collapse_algorithm_circuit.data = [d for d in quantum_collapse_algorithm_circuit.data if not isinstance(d[0], Instruction)]
-
-    # remove neighborhood contraint circuit and feasible circuit
-    for _ in range(len(neighborhood_constraint_qrs) + 1):
-            quantum_collapse_algorithm_circuit.qubits.pop()
-
-    quantum_collapse_algorithm_circuit.append(diffuser(len(output_qrs) * output_qrs[0].size), flatten([qubits for qubits in output_qrs]))
+    quantum_collapse_algorithm_circuit.append(diffuser(sum(output_qr.size for output_qr in output_qrs)), flatten([qubits for qubits in output_qrs]))
 
     if to_gate:
         gate = quantum_collapse_algorithm_circuit.to_gate()
@@ -252,17 +502,67 @@ def build_quantum_collapse_diffuser(quantum_collapse_algorithm_circuit, output_q
 
     return quantum_collapse_algorithm_circuit
 
-def build_quantum_collapse_grover_search_circuit(quantum_collapse_algorithm_circuit, C_n, output_qrs, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, num_iterations=1, to_gate=False):
+# built oracle and diffuser circuits of the most recently used circuit layouts and neighborhood constraints, see get_grover_circuits
+_grover_circuits = LRUCache(maxsize=64)
+
+# key of the oracle and diffuser, the quantum registers and neighborhood constraint output mapping determine the grid shape and neighborhood
+def grover_circuits_key(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_output_mapping, synthesis='esop', edge_constraints=None):
+    layout = [(qr.name, qr.size) for qr in quantum_collapse_algorithm_circuit.qregs]
+    layout += [(output_qr_1.name, output_qr_2.name, n_i) for output_qr_1, output_qr_2, n_i in neighborhood_constraint_output_mapping]
+
+    if edge_constraints is not None:
+        layout += [constraint_hash(relation) for relation in edge_constraints]
+
+    return hashlib.sha256((constraint_hash(C_n) + synthesis + repr(layout)).encode()).hexdigest()
+
+# builds the oracle and diffuser circuits once, they are cached in memory and in cache_dir as qpy when it is given
+def get_grover_circuits(quantum_collapse_algorithm_circuit, C_n, output_qrs, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, cache_dir=None, synthesis='esop', edge_constraints=None):
+    key = grover_circuits_key(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_output_mapping, synthesis=synthesis, edge_constraints=edge_constraints)
+
+    if key in _grover_circuits:
+        return _grover_circuits[key]
+
+    cache_path = None if cache_dir is None else os.path.join(cache_dir, f'grover_{key}.qpy')
+    circuits = None
+
+    if cache_path is not None and os.path.exists(cache_path):
+        # a corrupt or incompatible cache file is rebuilt and overwritten
+        try:
+            with open(cache_path, 'rb') as file:
+                circuits = qpy.load(file)
+        except Exception:
+            circuits = None
+
+    if circuits is not None and len(circuits) == 2:
+        oracle, diffuser_circuit = circuits
+    else:
+        oracle = build_quantum_collapse_oracle(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_output_mapping, neighborhood_constraint_qrs, synthesis=synthesis, edge_constraints=edge_constraints)
+        diffuser_circuit = build_quantum_collapse_diffuser(quantum_collapse_algorithm_circuit, output_qrs, neighborhood_constraint_qrs)
+
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            write_atomic(cache_path, lambda file: qpy.dump([oracle, diffuser_circuit], file))
+
+    _grover_circuits[key] = oracle, diffuser_circuit
+
+    return oracle, diffuser_circuit
+
+def build_quantum_collapse_grover_search_circuit(quantum_collapse_algorithm_circuit, C_n, output_qrs, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, num_iterations=1, to_gate=False, cache_dir=None, synthesis='esop', edge_constraints=None):
     quantum_collapse_algorithm_circuit = quantum_collapse_algorithm_circuit.copy()
 
     # remove all instructions
     quantum_collapse_algorithm_circuit.data = [d for d in quantum_collapse_algorithm_circuit.data if not isinstance(d[0], Instruction)]
 
-    for _ in range(num_iterations):
-        oracle = build_quantum_collapse_oracle(quantum_collapse_algorithm_circuit, C_n, neighborhood_constraint_output_mapping, neighborhood_constraint_qrs, to_gate=True)
+    # the oracle and diffuser are the same in every iteration
+    oracle_circuit, diffuser_circuit = get_grover_circuits(quantum_collapse_algorithm_circuit, C_n, output_qrs, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, cache_dir=cache_dir, synthesis=synthesis, edge_constraints=edge_constraints)
+
+    oracle = oracle_circuit.to_gate()
+    oracle.name = f'QC Oracle'
 
-        diffuser_gate = build_quantum_collapse_diffuser(quantum_collapse_algorithm_circuit, output_qrs, neighborhood_constraint_qrs, to_gate=True)
+    diffuser_gate = diffuser_circuit.to_gate()
+    diffuser_gate.name = f'U_s'
 
+    for _ in range(num_iterations):
         quantum_collapse_algorithm_circuit.append(oracle, quantum_collapse_algorithm_circuit.qubits)
 
         quantum_collapse_algorithm_circuit.append(diffuser_gate, flatten([qubits for qubits in output_qrs]))
@@ -272,4 +572,112 @@ def build_quantum_collapse_grover_search_circuit(quantum_collapse_algorithm_circ
         gate.name = f'QC Grover'
         return gate
 
-    return quantum_collapse_algorithm_circuit
\ No newline at end of file
+    return quantum_collapse_algorithm_circuit
+
+# estimated t gates of a multi-controlled toffoli decomposed into 2 (num_controls - 1) - 1 toffolis of 7 t gates
+def _mct_t_count(num_controls):
+    if num_controls < 2:
+        return 0
+    return 7 * (2 * num_controls - 3)
+
+# registers of the quantum collapse grover search without building its circuit, output_domains optionally restricts the output parts
+# like in quantum_collapse_qc (output parts with one possible state are left out)
+# returns (output parts, edges) where output parts are (flat index, local states, number of qubits) of the output quantum registers
+# in order and edges are (output part 1, neighborhood index, output part 2, relation) of the neighborhood constraint registers
+# where the output parts are indexes into output parts and relation[s1, s2] is the neighborhood constraint between their local states
+def grover_search_layout(output_size, neighborhood, C_n, output_domains=None, topology=None):
+    if topology is None:
+        topology = GridTopology(neighborhood, tuple(output_size))
+
+    C_n = np.asarray(C_n) == 1
+    num_states = C_n.shape[0]
+
+    output_parts = []
+    output_part_indexes = {}
+    for flat_index, o_i in enumerate(topology.indexes):
+        if output_domains is None:
+            local_states, num_qubits = np.arange(num_states), math.ceil(math.log2(num_states))
+        elif np.count_nonzero(output_domains[o_i]) > 1:
+            num_qubits = math.ceil(math.log2(np.count_nonzero(output_domains[o_i])))
+            local_states = local_domain_states(output_domains[o_i], num_qubits)
+        else:
+            continue
+
+        output_part_indexes[flat_index] = len(output_parts)
+        output_parts.append((flat_index, local_states, num_qubits))
+
+    edges = []
+    for flat_index, n_i, neighbor_flat_index in topology.edges():
+        if flat_index not in output_part_indexes or neighbor_flat_index not in output_part_indexes:
+            continue
+
+        output_part_1, output_part_2 = output_part_indexes[flat_index], output_part_indexes[neighbor_flat_index]
+        relation = C_n[output_parts[output_part_1][1], n_i][:, output_parts[output_part_2][1]]
+        edges.append((output_part_1, n_i, output_part_2, relation))
+
+    return output_parts, edges
+
+# resources of the quantum collapse grover search circuit from the grid, neighborhood and constraint without building it
+# output_domains optionally restricts the output parts like in quantum_collapse_qc (output parts with one possible state are left out)
+# returns a dict of
+# qubits, output_qubits and ancilla_qubits: number of qubits
+# mcts: number of multi-controlled toffolis, t_count: estimated t gates once they are decomposed
+# depth: upper bound of the depth with every multi-controlled toffoli counted as one layer
+# statevector_memory: bytes of a complex128 statevector of all qubits
+def estimate_quantum_collapse_resources(output_size, neighborhood, C_n, num_iterations=1, output_domains=None, synthesis='esop', topology=None):
+    if synthesis not in ORACLE_SYNTHESIS_MODES:
+        raise ValueError('Invalid oracle synthesis mode')
+
+    output_parts, edges = grover_search_layout(output_size, neighborhood, C_n, output_domains=output_domains, topology=topology)
+
+    num_edges = len(edges)
+    constraint_mcts = []
+    cubes = {}
+
+    for output_part_1, _, output_part_2, relation in edges:
+        num_qubits_1, num_qubits_2 = output_parts[output_part_1][2], output_parts[output_part_2][2]
+        constraint_mcts += [bin(mask).count('1') for _, mask in _edge_cubes(cubes, relation, num_qubits_1, num_qubits_2, synthesis) if mask != 0]
+
+    output_qubits = sum(num_qubits for _, _, num_qubits in output_parts)
+    ancilla_qubits = num_edges + 1
+
+    # the oracle computes and uncomputes the constraint around the feasibility check, the diffuser has one mct
+    # (without edges the feasibility check is an x gate and the diffuser of a single qubit a z gate)
+    iteration_controls = constraint_mcts * 2 + [num_controls for num_controls in (num_edges, output_qubits - 1) if num_controls > 0]
+    # an mct with negated controls has an x layer before and after it, the diffuser has 6 layers of single qubit gates
+    iteration_depth = 2 * 3 * len(constraint_mcts) + 1 + 7
+    num_qubits = output_qubits + ancilla_qubits
+
+    return {
+        'qubits': num_qubits,
+        'output_qubits': output_qubits,
+        'ancilla_qubits': ancilla_qubits,
+        'mcts': num_iterations * len(iteration_controls),
+        't_count': num_iterations * sum(_mct_t_count(num_controls) for num_controls in iteration_controls),
+        # superposition and feasible qubit preparation before the iterations and the measurement after them
+        'depth': 3 + num_iterations * iteration_depth,
+        'statevector_memory': 16 * 2**num_qubits,
+    }
+
+# picks the first aer simulation method of SIMULATION_METHODS whose limits the estimate (see estimate_quantum_collapse_resources)
+# is within, the matrix product state and extended stabilizer methods support at most max_qubits qubits
+# raises ResourceLimitError when no method is within its limits
+def select_simulation_method(
+    estimate,
+    max_statevector_memory=2**32,
+    max_matrix_product_state_mcts=1000,
+    max_extended_stabilizer_t_count=64,
+    max_qubits=63,
+):
+    if estimate['statevector_memory'] <= max_statevector_memory:
+        return 'statevector'
+
+    if estimate['qubits'] <= max_qubits and estimate['mcts'] <= max_matrix_product_state_mcts:
+        return 'matrix_product_state'
+
+    if estimate['qubits'] <= max_qubits and estimate['t_count'] <= max_extended_stabilizer_t_count:
+        return 'extended_stabilizer'
+
+    raise ResourceLimitError(
+        f"circuit of {estimate['qubits']} qubits, {estimate['mcts']} mcts and {estimate['t_count']} t gates "
+        f"({estimate['statevector_memory'] / 2**30:.1f} GiB statevector) exceeds the simulation limits", estimate)
@@ -0,0 +1,123 @@
+import hashlib
+import io
+import json
+import os
+from typing import Tuple
+
+import numpy as np
+
+from ..cache import write_atomic
+from ..input import create_adjacency_matrix, create_patches, parse_input_directory, read_input, unique_patches
+
+# a compiled ruleset is everything the generation needs from an input: the unique patches stacked into one atlas, the adjacency
+# tensor of the unique patches and the state of every input patch, it is stored as .npy files in a directory named by a hash of
+# the input bytes, patch size, neighborhood and adjacency type so it is only compiled once and can be memory-mapped
+
+# bumped when the stored files change so older compiled rulesets are not loaded
+RULESET_VERSION = 1
+
+_RULESET_ARRAYS = ('atlas', 'adjacency_matrix', 'patch_states', 'counts')
+
+class Ruleset():
+    def __init__(self, atlas, adjacency_matrix, patch_states, counts, input_type) -> None:
+        # (states,) + patch shape
+        self.atlas = atlas
+        # (states, neighborhood size, states) boolean
+        self.adjacency_matrix = adjacency_matrix
+        # state of every input patch, for a directory input the state of every file in sorted file name order
+        self.patch_states = patch_states
+        # how often every state occurs in the input
+        self.counts = counts
+        self.input_type = input_type
+
+    # object array of the unique patches like unique_patches returns, the patches are views of the atlas
+    @property
+    def patches(self):
+        patches = np.empty(len(self.atlas), dtype=object)
+        for i in range(len(self.atlas)):
+            patches[i] = self.atlas[i]
+        return patches
+
+# files of a directory input in sorted order so the ruleset does not depend on the directory listing order
+def _input_files(input):
+    return [os.path.join(input, f) for f in sorted(os.listdir(input))]
+
+# [(name, bytes)] of the input, a directory gives every file and a url is downloaded once (into cache_dir when it is given)
+def read_input_bytes(input, cache_dir=None):
+    if os.path.isdir(input):
+        return [(os.path.basename(file_path), read_input(file_path)) for file_path in _input_files(input)]
+
+    return [(os.path.basename(input), read_input(input, cache_dir=cache_dir))]
+
+def ruleset_key(input_bytes, patch_size: Tuple[int, ...], neighborhood, type_='overlapping_boundaries', directory=False):
+    key = hashlib.sha256(repr((RULESET_VERSION, tuple(patch_size), tuple(map(tuple, neighborhood)), type_, directory)).encode())
+    # file names do not change the ruleset, only the file contents and their order
+    for _, data in input_bytes:
+        key.update(hashlib.sha256(data).digest())
+    return key.hexdigest()
+
+# parses and compiles input_bytes (see read_input_bytes), a single input is split into patch_size patches
+# directory is the path of a directory input, its files are decoded by parse_input_directory (in parallel threads, cached in
+# input_cache_dir when it is given) and every file is one patch
+def compile_ruleset(input_bytes, patch_size: Tuple[int, ...], neighborhood, type_='overlapping_boundaries', directory=None, input_cache_dir=None):
+    if directory is None:
+        patches, _, input_type = create_patches(io.BytesIO(input_bytes[0][1]), patch_size)
+    else:
+        patches, input_type = parse_input_directory(directory, cache_dir=input_cache_dir)
+
+    states, counts, patch_states = unique_patches(patches)
+
+    if len(set(state.shape for state in states)) != 1:
+        raise ValueError('patches of a ruleset must have the same shape')
+
+    atlas = np.stack(list(states))
+    adjacency_matrix = create_adjacency_matrix(states, neighborhood, type_=type_)
+
+    return Ruleset(atlas, adjacency_matrix, patch_states, counts, input_type)
+
+def save_ruleset(directory, ruleset):
+    os.makedirs(directory, exist_ok=True)
+
+    # every file is written atomically and ruleset.json last so concurrent runs never load a partial ruleset
+    for name in _RULESET_ARRAYS:
+        array = np.asarray(getattr(ruleset, name))
+        write_atomic(os.path.join(directory, f'{name}.npy'), lambda file: np.save(file, array))
+
+    metadata = json.dumps({'version': RULESET_VERSION, 'input_type': ruleset.input_type}).encode()
+    write_atomic(os.path.join(directory, 'ruleset.json'), lambda file: file.write(metadata))
+
+# loads the arrays of a saved ruleset as read only memory-mapped arrays, returns None when there is no ruleset in directory
+def load_ruleset(directory, mmap_mode='r'):
+    metadata_path = os.path.join(directory, 'ruleset.json')
+    if not os.path.exists(metadata_path):
+        return None
+
+    with open(metadata_path) as file:
+        metadata = json.load(file)
+
+    if metadata['version'] != RULESET_VERSION:
+        return None
+
+    arrays = [np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in _RULESET_ARRAYS]
+
+    return Ruleset(*arrays, metadata['input_type'])
+
+# loads the compiled ruleset of input from cache_dir or compiles and saves it, returns (ruleset, key)
+# a url input is downloaded into input_cache_dir when it is given (see qca.input.read_input)
+def get_ruleset(input, patch_size: Tuple[int, ...], neighborhood, cache_dir, type_='overlapping_boundaries', input_cache_dir=None):
+    input_is_directory = os.path.isdir(input)
+    input_bytes = read_input_bytes(input, cache_dir=input_cache_dir)
+    key = ruleset_key(input_bytes, patch_size, neighborhood, type_=type_, directory=input_is_directory)
+    directory = os.path.join(cache_dir, f'ruleset_{key}')
+
+    ruleset = load_ruleset(directory)
+    if ruleset is None:
+        ruleset = compile_ruleset(input_bytes, patch_size, neighborhood, type_=type_, directory=input if input_is_directory else None, input_cache_dir=input_cache_dir)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        save_ruleset(directory, ruleset)
+
+        # the saved ruleset is memory-mapped like a cached one
+        ruleset = load_ruleset(directory) or ruleset
+
+    return ruleset, key
@@ -0,0 +1,82 @@
+import numpy as np
+
+from ..backends import ResourceLimitError
+
+# simulates the quantum collapse grover search on the amplitudes of the output quantum registers only, the oracle marks the
+# basis states whose register values satisfy every neighborhood constraint edge so the ancilla qubits of the circuit are not needed
+
+# basis states the feasibility mask is built for at a time, so its temporary arrays stay small next to the amplitude vector
+MASK_CHUNK_SIZE = 2**16
+
+# bytes grover_probabilities needs for num_qubits output qubits: the float amplitude vector, the boolean feasibility mask and the
+# temporary basis states, register values and allowed pairs of a chunk of the mask (int64 and boolean arrays)
+def grover_memory(num_qubits):
+    return 9 * 2**num_qubits + 25 * min(MASK_CHUNK_SIZE, 2**num_qubits)
+
+# (2**output qubits,) boolean mask of the basis states the oracle marks, basis state bits are the output quantum registers in order
+# with the first register in the lowest bits (the order they are measured in)
+def grover_feasibility_mask(output_parts, edges):
+    offsets = np.cumsum([0] + [num_qubits for _, _, num_qubits in output_parts])
+    feasible = np.ones(2**int(offsets[-1]), dtype=bool)
+
+    padded_relations = []
+    for output_part_1, _, output_part_2, relation in edges:
+        # register values that do not encode a state are never allowed
+        padded_relation = np.zeros((2**output_parts[output_part_1][2], 2**output_parts[output_part_2][2]), dtype=bool)
+        padded_relation[:relation.shape[0], :relation.shape[1]] = relation
+        padded_relations.append(padded_relation)
+
+    for start in range(0, len(feasible), MASK_CHUNK_SIZE):
+        basis_states = np.arange(start, min(start + MASK_CHUNK_SIZE, len(feasible)), dtype=np.int64)
+        feasible_chunk = feasible[start:start + len(basis_states)]
+
+        def register_values(output_part):
+            return (basis_states >> offsets[output_part]) & ((1 << output_parts[output_part][2]) - 1)
+
+        for (output_part_1, _, output_part_2, _), padded_relation in zip(edges, padded_relations):
+            feasible_chunk &= padded_relation[register_values(output_part_1), register_values(output_part_2)]
+
+    return feasible
+
+# measurement probabilities (2**output qubits,) of the output quantum registers after num_iterations grover iterations on their
+# uniform superposition, output_parts and edges are the registers of grover_search_layout
+# max_memory bounds the bytes of every array of the simulation (see grover_memory)
+def grover_probabilities(output_parts, edges, num_iterations, max_memory=2**32):
+    num_qubits = sum(num_qubits for _, _, num_qubits in output_parts)
+
+    if grover_memory(num_qubits) > max_memory:
+        raise ResourceLimitError(f'simulation of {num_qubits} qubits ({grover_memory(num_qubits) / 2**30:.1f} GiB) exceeds the memory limit',
+                                 {'output_qubits': num_qubits, 'memory': grover_memory(num_qubits)})
+
+    feasible = grover_feasibility_mask(output_parts, edges)
+
+    # the amplitudes stay real so a float vector is enough
+    amplitudes = np.full(2**num_qubits, 1 / np.sqrt(2**num_qubits))
+
+    for _ in range(num_iterations):
+        # oracle: phase flip of the feasible basis states
+        np.negative(amplitudes, out=amplitudes, where=feasible)
+
+        # diffuser: inversion about the mean
+        np.subtract(2 * amplitudes.mean(), amplitudes, out=amplitudes)
+
+    # the amplitude vector is reused for the probabilities
+    probabilities = np.square(amplitudes, out=amplitudes)
+    probabilities /= probabilities.sum()
+
+    return probabilities
+
+# samples shots measurements of grover_probabilities and returns the measured bit strings like the memory of an aer job
+def sample_grover_search(output_parts, edges, num_iterations, shots, rng=None, max_memory=2**32):
+    if rng is None:
+        rng = np.random.default_rng()
+
+    num_qubits = sum(num_qubits for _, _, num_qubits in output_parts)
+    probabilities = grover_probabilities(output_parts, edges, num_iterations, max_memory=max_memory)
+
+    # inverse transform sampling on the cumulative probabilities, computed in place so no other vector of the same size is allocated
+    cumulative_probabilities = np.cumsum(probabilities, out=probabilities)
+    measurements = np.searchsorted(cumulative_probabilities, rng.random(shots) * cumulative_probabilities[-1], side='right')
+    measurements = np.minimum(measurements, len(cumulative_probabilities) - 1)
+
+    return [format(measurement, f'0{num_qubits}b') for measurement in measurements]
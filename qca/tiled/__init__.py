@@ -0,0 +1,130 @@
+import math
+from typing import Tuple
+
+import numpy as np
+
+from .. import quantum_collapse
+from ..collapse import BinaryCollapse
+from ..topology import GridTopology
+
+# possible states of a tile's output parts given the already generated neighbors outside the tile
+def _tile_initial_output(output_assignments, tile_start, tile_stop, neighborhood, adjacency_contraint):
+    tile_shape = tuple(tile_stop - tile_start)
+    num_states = adjacency_contraint.shape[0]
+    initial_output = np.ones(tile_shape + (num_states,), dtype=bool)
+
+    neighborhood_indexes = {tuple(n): n_i for n_i, n in enumerate(neighborhood)}
+    output_parts = np.indices(tile_shape).reshape(len(tile_shape), -1).T + tile_start
+
+    for n_i, n in enumerate(neighborhood):
+        neighbor_indexes = output_parts + np.array(n)
+
+        outside_tile = np.any((neighbor_indexes < tile_start) | (neighbor_indexes >= tile_stop), axis=1)
+        in_bounds = np.all((neighbor_indexes >= 0) & (neighbor_indexes < np.array(output_assignments.shape)), axis=1)
+        neighbor_indexes = neighbor_indexes[outside_tile & in_bounds]
+        tile_indexes = output_parts[outside_tile & in_bounds] - tile_start
+
+        neighbor_states = np.asarray(output_assignments[tuple(neighbor_indexes.T)])
+        assigned = neighbor_states != -1
+        neighbor_states = neighbor_states[assigned]
+        tile_indexes = tile_indexes[assigned]
+
+        # states that allow the neighbor's state in direction n, and that the neighbor allows in the opposite direction
+        possible_states = adjacency_contraint[:, n_i, neighbor_states].T
+        opposite_n_i = neighborhood_indexes.get(tuple(-i for i in n))
+        if opposite_n_i is not None:
+            possible_states = possible_states & adjacency_contraint[neighbor_states, opposite_n_i, :]
+
+        initial_output[tuple(tile_indexes.T)] &= possible_states
+
+    return initial_output
+
+# generates the output one tile at a time in C order, the borders of a tile are fixed by the already generated tiles
+# only the possible states of the current tile are kept in memory, assignments are written to assignments_path
+# (a .npy file opened as a memory-mapped array) when it is given
+# a tile that is still inconsistent after max_tile_attempts keeps its unassigned (-1) output parts, a tile with an output part
+# that no state is possible for next to the already generated tiles is not attempted and stays unassigned
+# metrics (see qca.metrics) is passed to every tile and counts the tiles, tile attempts and tiles that are not attempted
+# (tile_contradictions)
+def quantum_collapse_tiled(
+    states,
+    output_size: Tuple[int, ...],
+    neighborhood,
+    adjacency_contraint,
+    tile_size: Tuple[int, ...],
+    assignments_path=None,
+    max_tile_attempts=10,
+    backtrack_limit=0,
+    dechorence_selector=None,
+    collapse=BinaryCollapse(),
+    metrics=None,
+):
+    output_size = tuple(output_size)
+    tile_size = tuple(tile_size)
+
+    if len(tile_size) != len(output_size):
+        raise ValueError('tile size must have the same number of dimensions as the output size')
+
+    adjacency_contraint = np.asarray(adjacency_contraint) == 1
+
+    if assignments_path is None:
+        output_assignments = np.full(output_size, -1, dtype=np.int32)
+    else:
+        output_assignments = np.lib.format.open_memmap(assignments_path, mode='w+', dtype=np.int32, shape=output_size)
+        output_assignments[...] = -1
+
+    num_tiles = tuple(math.ceil(o / t) for o, t in zip(output_size, tile_size))
+    topologies = {}
+    output_is_consistent = True
+
+    for tile_index in np.ndindex(num_tiles):
+        tile_start = np.array(tile_index) * np.array(tile_size)
+        tile_stop = np.minimum(tile_start + np.array(tile_size), np.array(output_size))
+        tile_shape = tuple(int(i) for i in tile_stop - tile_start)
+        tile_slices = tuple(slice(start, stop) for start, stop in zip(tile_start, tile_stop))
+
+        # edge tiles can be smaller, share the topology between tiles of the same shape
+        topology = topologies.get(tile_shape)
+        if topology is None:
+            topology = topologies[tile_shape] = GridTopology(neighborhood, tile_shape)
+
+        initial_output = _tile_initial_output(output_assignments, tile_start, tile_stop, neighborhood, adjacency_contraint)
+
+        # an output part without a possible state next to the generated neighbors can not be fixed by another attempt
+        if not np.all(np.any(initial_output, axis=-1)):
+            tile_is_consistent = False
+            tile_assignments = -1
+
+            if metrics is not None:
+                metrics.count('tile_contradictions')
+        else:
+            for _ in range(max_tile_attempts):
+                tile_is_consistent, tile_assignments, _ = quantum_collapse(
+                    states,
+                    tile_shape,
+                    neighborhood,
+                    adjacency_contraint,
+                    dechorence_selector=dechorence_selector,
+                    collapse=collapse,
+                    topology=topology,
+                    backtrack_limit=backtrack_limit,
+                    initial_output=initial_output,
+                    metrics=metrics,
+                )
+
+                if metrics is not None:
+                    metrics.count('tile_attempts')
+
+                if tile_is_consistent:
+                    break
+
+        if metrics is not None:
+            metrics.count('tiles')
+
+        output_is_consistent = output_is_consistent and tile_is_consistent
+        output_assignments[tile_slices] = tile_assignments
+
+    if isinstance(output_assignments, np.memmap):
+        output_assignments.flush()
+
+    return output_is_consistent, output_assignments
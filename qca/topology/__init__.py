@@ -0,0 +1,48 @@
+from functools import cached_property
+from typing import Tuple
+
+import numpy as np
+
+# neighbor table value for neighbors that are out of bounds
+OUT_OF_BOUNDS = -1
+
+class GridTopology():
+    # neighborhood is a list of neighbor vectors as created by create_neighborhood
+    # shape is the output shape without the states dimension
+    def __init__(self, neighborhood, shape: Tuple[int, ...]) -> None:
+        self.neighborhood = neighborhood
+        self.shape = tuple(shape)
+        self.size = int(np.prod(self.shape, dtype=int))
+
+        # neighbors[flat_index, neighborhood_index] is the flat index of the neighbor or OUT_OF_BOUNDS
+        self.neighbors = np.full((self.size, len(neighborhood)), OUT_OF_BOUNDS, dtype=np.intp)
+
+        indexes = np.indices(self.shape).reshape(len(self.shape), -1)
+        for n_i, neighbor_vector in enumerate(neighborhood):
+            neighbor_indexes = indexes + np.array(neighbor_vector).reshape(-1, 1)
+            in_bounds = np.all((neighbor_indexes >= 0) & (neighbor_indexes < np.array(self.shape).reshape(-1, 1)), axis=0)
+
+            self.neighbors[in_bounds, n_i] = np.ravel_multi_index(neighbor_indexes[:, in_bounds], self.shape)
+
+    # indexes[flat_index] is the output index of a flat index, built on first use since only the classical collapse needs it
+    @cached_property
+    def indexes(self):
+        return list(np.ndindex(self.shape))
+
+    # python lists are faster than numpy arrays for scalar lookups in hot loops, built on first use like indexes
+    @cached_property
+    def neighbor_lists(self):
+        return self.neighbors.tolist()
+
+    def flat_index(self, index):
+        return int(np.ravel_multi_index(index, self.shape))
+
+    def index(self, flat_index):
+        return self.indexes[flat_index]
+
+    # yields (flat index, neighborhood index, neighbor flat index) for every in bounds neighbor pair
+    def edges(self):
+        for flat_index, neighbors in enumerate(self.neighbor_lists):
+            for n_i, neighbor_flat_index in enumerate(neighbors):
+                if neighbor_flat_index != OUT_OF_BOUNDS:
+                    yield flat_index, n_i, neighbor_flat_index
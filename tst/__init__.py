@@ -1,9 +1,15 @@
+import random
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
 import numpy as np
 
-from qca import feasible_on_neighborhood_constraint
+import qca
+from qca import create_neighborhood, feasible_on_neighborhood_constraint, quantum_collapse, quantum_collapse_hybrid, quantum_collapse_qc, restrict_to_fixed_neighbors
+from qca.backends import get_backend
 from qca.input import create_neighborhood_constraint_from_example
+from tst.fixtures import banded_adjacency_constraint, random_adjacency_constraint
 
 def convert_to_state_index_assignment(states, input):
     input_assignments = np.zeros_like(input, dtype=int)
@@ -41,5 +47,154 @@ class FeasibleTest(unittest.TestCase):
             feasible = feasible_on_neighborhood_constraint(assignments, c_n, neighborhood)
             self.assertFalse(feasible)
 
+    def test_violation_map_and_batch(self):
+        rng = np.random.default_rng(0)
+        neighborhood = create_neighborhood(num_dimensions=2)
+        c_n = rng.random((3, len(neighborhood), 3)) < 0.7
+
+        batch = rng.integers(-1, 3, size=(4, 5, 6))
+        feasible, violations, num_violations = feasible_on_neighborhood_constraint(batch, c_n, neighborhood, return_violations=True)
+
+        for i, assignments in enumerate(batch):
+            expected_violations = np.zeros(assignments.shape, dtype=int)
+            for index, state in np.ndenumerate(assignments):
+                for n_i, n in enumerate(neighborhood):
+                    neighbor_index = tuple(np.array(index) + np.array(n))
+                    if state == -1 or min(neighbor_index) < 0 or np.any(np.array(neighbor_index) >= assignments.shape):
+                        continue
+                    if assignments[neighbor_index] != -1 and not c_n[state, n_i, assignments[neighbor_index]]:
+                        expected_violations[index] += 1
+
+            self.assertTrue(np.array_equal(violations[i], expected_violations))
+            self.assertEqual(num_violations[i], expected_violations.sum())
+            self.assertEqual(feasible[i], expected_violations.sum() == 0)
+            self.assertEqual(feasible_on_neighborhood_constraint(assignments, c_n, neighborhood), feasible[i])
+
+        # unassigned output parts never violate the neighborhood constraint
+        self.assertTrue(feasible_on_neighborhood_constraint(np.full((5, 6), -1), c_n, neighborhood))
+
+class BacktrackingTest(unittest.TestCase):
+    def test_backtracking_resolves_contradiction(self):
+        num_states = 8
+        neighborhood = create_neighborhood(num_dimensions=2)
+
+        adjacency_contraint = random_adjacency_constraint(num_states, neighborhood, 0.3, seed=1)
+
+        # seed 1 runs into a contradiction without backtracking
+        random.seed(1)
+        np.random.seed(1)
+        consistent, _, _ = quantum_collapse(range(num_states), (10, 10), neighborhood, adjacency_contraint)
+        self.assertFalse(consistent)
+
+        random.seed(1)
+        np.random.seed(1)
+        consistent, assignments, _ = quantum_collapse(range(num_states), (10, 10), neighborhood, adjacency_contraint, backtrack_limit=1000)
+        self.assertTrue(consistent)
+        self.assertTrue(np.all(assignments != -1))
+        self.assertTrue(feasible_on_neighborhood_constraint(assignments, adjacency_contraint, neighborhood))
+
+class SelectorTest(unittest.TestCase):
+    def test_concurrent_runs_do_not_share_the_selector(self):
+        num_states = 4
+        neighborhood = create_neighborhood(num_dimensions=2)
+        states = np.arange(num_states)
+        adjacency_contraint = banded_adjacency_constraint(num_states, neighborhood)
+
+        # the default selector keeps state between collapses so every call needs its own
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: quantum_collapse(states, (24, 24), neighborhood, adjacency_contraint), range(8)))
+
+        for consistent, assignments, _ in results:
+            self.assertTrue(consistent)
+            self.assertTrue(np.all(assignments != -1))
+            self.assertTrue(feasible_on_neighborhood_constraint(assignments, adjacency_contraint, neighborhood))
+
+class HybridTest(unittest.TestCase):
+    def setUp(self):
+        self.states = np.array(['a', 'b', 'c', 'd'])
+        self.neighborhood = create_neighborhood(num_dimensions=2)
+        self.c_n = create_neighborhood_constraint_from_example(self.states, np.array([['a', 'a', 'b'], ['a', 'd', 'b'], ['a', 'c', 'd']]), self.neighborhood)
+
+    def test_restrict_to_fixed_neighbors(self):
+        output_domains = np.ones((3, 3, len(self.states)), dtype=bool)
+        output_domains[1, 1] = np.arange(len(self.states)) == 3
+
+        output_domains = restrict_to_fixed_neighbors(output_domains, self.neighborhood, self.c_n)
+
+        for n_i, n in enumerate(self.neighborhood):
+            neighbor_domain = output_domains[1 + n[0], 1 + n[1]]
+            self.assertTrue(np.all(neighbor_domain <= (self.c_n[3, n_i, :] == 1)))
+
+    def test_hybrid_output_is_feasible(self):
+        # a 3x3 grid needs too many qubits to simulate without fixing output parts classically first
+        feasible, assignments, distribution = quantum_collapse_hybrid(self.states, (3, 3), self.neighborhood, self.c_n, max_attempts=32, return_distribution=True)
+
+        self.assertTrue(feasible)
+        self.assertTrue(np.all(assignments != -1))
+        for flat_assignments in distribution:
+            self.assertTrue(feasible_on_neighborhood_constraint(np.array(flat_assignments).reshape(3, 3), self.c_n, self.neighborhood))
+
+    def test_searched_output_parts_without_edges(self):
+        # a single searched output part, and two that are not neighbors, have no neighborhood constraint registers
+        for searched in [[(0, 0)], [(0, 0), (1, 1)]]:
+            output_domains = np.zeros((2, 2, len(self.states)), dtype=bool)
+            output_domains[..., 0] = True
+            for index in searched:
+                output_domains[index] = np.ones(len(self.states), dtype=bool)
+
+            feasible, assignments, distribution = quantum_collapse_qc(self.states, (2, 2), self.neighborhood, np.ones((4, 4, 4)), max_attempts=32,
+                                                                      return_distribution=True, output_domains=output_domains, engine='aer')
+
+            self.assertTrue(feasible)
+            self.assertTrue(np.all(assignments != -1))
+            # every assignment of the searched output parts is feasible so grover's search measures all of them
+            self.assertGreater(len(distribution), 1)
+
+    def test_classical_collapses_shrink_the_search(self):
+        # in a row of 6 only c allows a left and a right neighbor so the inner output parts are fixed to c by the initial pruning,
+        # a can only be on the left end (a c) and b on the right end (c b)
+        right = np.array([[0, 0, 1], [0, 0, 0], [0, 1, 1]], dtype=bool)
+        c_n = np.ones((3, len(self.neighborhood), 3), dtype=bool)
+        c_n[:, 2, :] = right
+        c_n[:, 3, :] = right.T
+
+        for classical_collapses in range(3):
+            with mock.patch('qca.quantum_collapse_qc', return_value=(True, None)) as quantum_collapse_qc:
+                quantum_collapse_hybrid(range(3), (1, 6), self.neighborhood, c_n, classical_collapses=classical_collapses)
+
+            output_domains = quantum_collapse_qc.call_args.kwargs['output_domains']
+            # output parts that were already fixed do not use up classical collapses
+            self.assertEqual(np.count_nonzero(output_domains.sum(axis=-1) > 1), 2 - classical_collapses)
+
+class TranspiledCircuitCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.states = np.array(['a', 'b', 'c', 'd'])
+        self.neighborhood = create_neighborhood(num_dimensions=2)
+        self.c_n = create_neighborhood_constraint_from_example(self.states, np.array([['a', 'a', 'b'], ['a', 'd', 'b'], ['a', 'c', 'd']]), self.neighborhood)
+
+        qca._transpiled_circuits.clear()
+        self.addCleanup(qca._transpiled_circuits.clear)
+
+    def test_reused_per_iterations_and_backend(self):
+        import qiskit
+
+        with mock.patch('qiskit.transpile', wraps=qiskit.transpile) as transpile:
+            quantum_collapse_qc(self.states, (2, 2), self.neighborhood, self.c_n)
+            transpiled_circuit = next(iter(qca._transpiled_circuits.values()))
+
+            # the same search is transpiled once
+            quantum_collapse_qc(self.states, (2, 2), self.neighborhood, self.c_n)
+            self.assertEqual(transpile.call_count, 1)
+            self.assertEqual(len(qca._transpiled_circuits), 1)
+            self.assertIs(next(iter(qca._transpiled_circuits.values())), transpiled_circuit)
+
+            # another number of iterations or backend is another circuit
+            quantum_collapse_qc(self.states, (2, 2), self.neighborhood, self.c_n, num_iterations=2)
+            self.assertEqual(transpile.call_count, 2)
+
+            quantum_collapse_qc(self.states, (2, 2), self.neighborhood, self.c_n, sim=get_backend('aer_simulator_matrix_product_state'))
+            self.assertEqual(transpile.call_count, 3)
+            self.assertEqual(len(qca._transpiled_circuits), 3)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,26 @@
+import subprocess
+import sys
+import unittest
+
+from qca.backends import get_backend, register_backend
+
+class BackendRegistryTest(unittest.TestCase):
+    def test_backends_are_created_once_on_first_use(self):
+        created = []
+        register_backend('test_backend', lambda: created.append(object()) or created[-1])
+
+        self.assertEqual(created, [])
+        self.assertIs(get_backend('test_backend'), get_backend('test_backend'))
+        self.assertEqual(len(created), 1)
+
+        with self.assertRaises(ValueError):
+            get_backend('invalid_backend')
+
+    def test_import_does_not_import_qiskit(self):
+        code = "import sys, qca, qca.parallel, qca.tiled; print('qiskit' in sys.modules)"
+        output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+
+        self.assertEqual(output.strip(), 'False')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from qca import create_neighborhood, feasible_on_neighborhood_constraint
+from qca.batch import quantum_collapse_batch
+from tst.fixtures import random_adjacency_constraint
+
+class BatchTest(unittest.TestCase):
+    def test_consistent_samples_are_feasible(self):
+        num_states = 6
+        neighborhood = create_neighborhood(num_dimensions=2)
+
+        adjacency_contraint = random_adjacency_constraint(num_states, neighborhood, 0.5, seed=2)
+
+        consistent, assignments, output = quantum_collapse_batch(range(num_states), (6, 5), neighborhood, adjacency_contraint, batch_size=32, rng=np.random.default_rng(0))
+
+        self.assertEqual(consistent.shape, (32,))
+        self.assertEqual(assignments.shape, (32, 6, 5))
+        self.assertEqual(output.shape, (32, 6, 5, num_states))
+        self.assertTrue(consistent.any())
+
+        for i in np.flatnonzero(consistent):
+            self.assertTrue(np.all(assignments[i] != -1))
+            self.assertTrue(feasible_on_neighborhood_constraint(assignments[i], adjacency_contraint, neighborhood))
+
+    def test_contradictions_keep_partial_state(self):
+        num_states = 6
+        neighborhood = create_neighborhood(num_dimensions=2)
+
+        adjacency_contraint = random_adjacency_constraint(num_states, neighborhood, 0.3, seed=1)
+
+        consistent, assignments, output = quantum_collapse_batch(range(num_states), (10, 10), neighborhood, adjacency_contraint, batch_size=32, rng=np.random.default_rng(0))
+
+        self.assertFalse(consistent.all())
+        for i in np.flatnonzero(~consistent):
+            num_possible_states = output[i].sum(axis=-1)
+
+            # propagation stops at the contradicting output part instead of emptying the whole output
+            self.assertTrue(np.any(num_possible_states == 0))
+            self.assertTrue(np.any(num_possible_states > 0))
+            self.assertTrue(np.any(assignments[i] != -1))
+
+if __name__ == '__main__':
+    unittest.main()
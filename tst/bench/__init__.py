@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from bench import compare_results, load_results, save_results
+
+class CompareResultsTest(unittest.TestCase):
+    def test_regressions_beyond_tolerance(self):
+        baseline = {'a': {'seconds': 1.0}, 'b': {'seconds': 2.0}, 'c': {'seconds': 0.5}, 'removed': {'seconds': 1.0}}
+        results = {'a': {'seconds': 1.1}, 'b': {'seconds': 3.0}, 'c': {'seconds': 0.25}, 'added': {'seconds': 1.0}}
+
+        comparison = {name: (baseline_seconds, seconds, ratio, regressed) for name, baseline_seconds, seconds, ratio, regressed in compare_results(results, baseline, tolerance=0.2)}
+
+        # only benchmarks in both results are compared
+        self.assertEqual(set(comparison), {'a', 'b', 'c'})
+        self.assertEqual(comparison['b'][:2], (2.0, 3.0))
+        self.assertAlmostEqual(comparison['a'][2], 1.1)
+        self.assertAlmostEqual(comparison['b'][2], 1.5)
+        self.assertAlmostEqual(comparison['c'][2], 0.5)
+
+        self.assertFalse(comparison['a'][3])
+        self.assertTrue(comparison['b'][3])
+        # faster than the baseline is never a regression
+        self.assertFalse(comparison['c'][3])
+
+        # a larger tolerance accepts the slower benchmark
+        self.assertFalse(any(regressed for *_, regressed in compare_results(results, baseline, tolerance=0.6)))
+
+    def test_saved_results_are_a_baseline(self):
+        results = {'a': {'seconds': 1.0, 'states': 4}}
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'results.json')
+            save_results(file_path, results)
+            baseline = load_results(file_path)
+
+        self.assertEqual(baseline, results)
+        self.assertEqual(compare_results(results, baseline), [('a', 1.0, 1.0, 1.0, False)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from qca.cache import LRUCache, write_atomic
+
+class CacheTest(unittest.TestCase):
+    def test_lru_cache_drops_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache['a'] = 1
+        cache['b'] = 2
+
+        # getting a makes b the least recently used
+        self.assertEqual(cache['a'], 1)
+        cache['c'] = 3
+
+        self.assertEqual(list(cache), ['a', 'c'])
+
+    def test_write_atomic(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'file')
+            write_atomic(file_path, lambda file: file.write(b'data'))
+
+            with open(file_path, 'rb') as file:
+                self.assertEqual(file.read(), b'data')
+
+            # a failed write keeps the old file and leaves no temporary file
+            def fail(file):
+                file.write(b'partial')
+                raise RuntimeError()
+
+            with self.assertRaises(RuntimeError):
+                write_atomic(file_path, fail)
+
+            self.assertEqual(os.listdir(directory), ['file'])
+            with open(file_path, 'rb') as file:
+                self.assertEqual(file.read(), b'data')
+
+if __name__ == '__main__':
+    unittest.main()
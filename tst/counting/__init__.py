@@ -0,0 +1,41 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from qca import create_neighborhood, feasible_on_neighborhood_constraint
+from qca.counting import count_solutions, optimal_num_iterations
+from tst.fixtures import random_adjacency_constraint
+
+class CountSolutionsTest(unittest.TestCase):
+    def setUp(self):
+        self.num_states = 3
+        self.neighborhood = create_neighborhood(num_dimensions=2)
+
+        self.c_n = random_adjacency_constraint(self.num_states, self.neighborhood, 0.6, seed=0)
+
+    def brute_force_count(self, output_size):
+        return sum(feasible_on_neighborhood_constraint(np.array(assignments).reshape(output_size), self.c_n, self.neighborhood)
+                   for assignments in itertools.product(range(self.num_states), repeat=int(np.prod(output_size))))
+
+    def test_transfer_matrix_is_exact(self):
+        for output_size in [(2, 3), (3, 2), (3, 3)]:
+            num_solutions, exact = count_solutions(output_size, self.neighborhood, self.c_n)
+
+            self.assertTrue(exact)
+            self.assertEqual(num_solutions, self.brute_force_count(output_size))
+
+    def test_estimate_for_wide_rows(self):
+        num_solutions, exact = count_solutions((3, 2), self.neighborhood, self.c_n, max_row_configurations=1, num_samples=20000, rng=np.random.default_rng(0))
+
+        self.assertFalse(exact)
+        self.assertAlmostEqual(num_solutions, self.brute_force_count((3, 2)), delta=0.1 * self.brute_force_count((3, 2)))
+
+    def test_optimal_num_iterations(self):
+        self.assertEqual(optimal_num_iterations(256, 7), 4)
+        self.assertEqual(optimal_num_iterations(256, 256), 0)
+        self.assertEqual(optimal_num_iterations(256, 0), 0)
+        self.assertEqual(optimal_num_iterations(2**20, 1), 804)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import random
+import unittest
+
+import numpy as np
+
+from qca.decoherence import PriorityEntropyDechorence
+
+class PriorityEntropyDechorenceTest(unittest.TestCase):
+    def test_selects_lowest_entropy(self):
+        rng = random.Random(0)
+        output_curr_num_possible_states = np.full((6, 7), 8, dtype=int)
+        output_assignments = np.full((6, 7), -1, dtype=int)
+
+        selector = PriorityEntropyDechorence(choice=rng.choice)
+        selector.reset(output_curr_num_possible_states, output_assignments)
+
+        for _ in range(30):
+            index = selector(None, output_curr_num_possible_states, output_assignments)
+
+            unassigned = output_curr_num_possible_states[(output_assignments == -1) & (output_curr_num_possible_states > 0)]
+            self.assertEqual(output_curr_num_possible_states[index], unassigned.min())
+            self.assertEqual(output_assignments[index], -1)
+
+            # assign the selected output part and shrink or grow a few others
+            output_assignments[index] = 0
+            output_curr_num_possible_states[index] = 1
+            updated_indexes = [int(np.ravel_multi_index(index, output_assignments.shape))]
+            for _ in range(3):
+                i = rng.randrange(output_assignments.size)
+                output_curr_num_possible_states.reshape(-1)[i] = rng.randint(1, 8)
+                updated_indexes.append(i)
+
+            selector.update(updated_indexes, output_curr_num_possible_states, output_assignments)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+import unittest
+
+import numpy as np
+
+from qca.domain import domain_states, pack_domains, popcount, unpack_domains
+
+class PackedDomainTest(unittest.TestCase):
+    def test_pack_roundtrip(self):
+        num_states = 130
+        domains = np.random.default_rng(0).random((4, 3, num_states)) < 0.3
+
+        packed = pack_domains(domains)
+
+        self.assertEqual(packed.shape, (4, 3, 3))
+        self.assertEqual(packed.dtype, np.uint64)
+        self.assertTrue(np.array_equal(unpack_domains(packed, num_states), domains))
+        self.assertTrue(np.array_equal(popcount(packed), domains.sum(axis=-1)))
+        self.assertTrue(np.array_equal(domain_states(packed[2, 1]), np.flatnonzero(domains[2, 1])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+import numpy as np
+
+# adjacency constraints shared by the tests, neighborhood is a manhattan distance 1 neighborhood (see qca.create_neighborhood)
+# so the neighborhood indexes 2i and 2i + 1 are opposite directions
+
+# random adjacency constraint where a pair of states is allowed with probability p
+def random_adjacency_constraint(num_states, neighborhood, p, seed):
+    rng = np.random.default_rng(seed)
+    adjacency_contraint = rng.random((num_states, len(neighborhood), num_states)) < p
+
+    # opposite directions must agree on which states can be neighbors
+    for n_i in range(0, len(neighborhood), 2):
+        adjacency_contraint[:, n_i + 1, :] = adjacency_contraint[:, n_i, :].T
+
+    return adjacency_contraint
+
+# a state can only be next to itself or the states one above or below it in every direction
+def banded_adjacency_constraint(num_states, neighborhood):
+    states = np.arange(num_states)
+    return np.repeat((np.abs(states[:, None] - states[None, :]) <= 1)[:, None, :], len(neighborhood), axis=1)
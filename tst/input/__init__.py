@@ -0,0 +1,145 @@
+import functools
+import os
+import tempfile
+import threading
+import unittest
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+from qca import create_neighborhood
+from qca.input import create_adjacency_matrix, create_patches, parse_image, parse_input_directory, save_output, unique_patches
+
+def create_patch_grid(patch_size, grid_size, num_colors, seed=0):
+    rng = np.random.default_rng(seed)
+    patches = np.zeros(grid_size, dtype=object)
+    for i in np.ndindex(grid_size):
+        patches[i] = rng.integers(num_colors, size=patch_size + (1,), dtype=np.uint8)
+    return patches
+
+class AdjacencyMatrixTest(unittest.TestCase):
+    def test_matches_pairwise_boundary_comparison(self):
+        patches = create_patch_grid((2, 2), (5, 4), num_colors=2)
+        neighborhood = create_neighborhood(num_dimensions=2)
+
+        adjacency_matrix = create_adjacency_matrix(patches, neighborhood)
+
+        self.assertEqual(adjacency_matrix.dtype, bool)
+        self.assertEqual(adjacency_matrix.shape, patches.shape + (len(neighborhood),) + patches.shape)
+
+        for index1, patch1 in np.ndenumerate(patches):
+            for index2, patch2 in np.ndenumerate(patches):
+                for n_idx, n in enumerate(neighborhood):
+                    axis = n.index(1) if 1 in n else n.index(-1)
+                    if 1 in n:
+                        overlaps = np.array_equal(np.take(patch1, [-1], axis=axis), np.take(patch2, [0], axis=axis))
+                    else:
+                        overlaps = np.array_equal(np.take(patch1, [0], axis=axis), np.take(patch2, [-1], axis=axis))
+
+                    self.assertEqual(adjacency_matrix[index1 + (n_idx,) + index2], overlaps)
+
+class CreatePatchesTest(unittest.TestCase):
+    def test_strided_unique_patches(self):
+        rng = np.random.default_rng(0)
+        tiles = rng.integers(256, size=(3, 3, 4), dtype=np.uint8)
+        # 10x7 image of 3x3 tiles, the last row and column are cut off by the patch grid
+        image = np.tile(tiles, (4, 3, 1))[:10, :7]
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'input.png')
+            Image.fromarray(image).save(file_path)
+
+            patches, input, input_type = create_patches(file_path, (3, 3))
+
+        self.assertEqual(input_type, 'image')
+        self.assertEqual(patches.shape, (3, 2))
+
+        for (r, c), patch in np.ndenumerate(patches):
+            self.assertTrue(np.shares_memory(patch, input))
+            self.assertTrue(np.array_equal(patch, input[r*3:(r+1)*3, c*3:(c+1)*3]))
+
+        states, counts, patch_states = unique_patches(patches)
+
+        self.assertEqual(len(states), 1)
+        self.assertEqual(counts.tolist(), [6])
+        self.assertTrue(np.array_equal(patch_states, np.zeros((3, 2), dtype=int)))
+
+class QuietHTTPRequestHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+class InputCacheTest(unittest.TestCase):
+    def test_directory_decoded_once(self):
+        rng = np.random.default_rng(0)
+        images = [rng.integers(256, size=(3, 3, 4), dtype=np.uint8) for _ in range(8)]
+
+        with tempfile.TemporaryDirectory() as directory:
+            input_dir = os.path.join(directory, 'input')
+            cache_dir = os.path.join(directory, 'cache')
+            os.makedirs(input_dir)
+
+            # the same file twice is decoded and cached once
+            for i, image in enumerate(images + images[:1]):
+                Image.fromarray(image).save(os.path.join(input_dir, f'{i:02d}.png'))
+
+            patches, input_type = parse_input_directory(input_dir, cache_dir=cache_dir, workers=4)
+
+            self.assertEqual(input_type, 'image')
+            self.assertEqual(len(os.listdir(cache_dir)), len(images))
+            for patch, image in zip(patches, images + images[:1]):
+                self.assertTrue(np.array_equal(patch, image))
+
+            # later runs load the cached arrays instead of decoding the files
+            for file_name in os.listdir(cache_dir):
+                np.save(os.path.join(cache_dir, file_name), np.zeros((3, 3, 4), dtype=np.uint8))
+
+            cached_patches, _ = parse_input_directory(input_dir, cache_dir=cache_dir)
+            self.assertTrue(all(np.all(patch == 0) for patch in cached_patches))
+
+    def test_url_downloaded_once(self):
+        image = np.random.default_rng(0).integers(256, size=(4, 5, 4), dtype=np.uint8)
+
+        with tempfile.TemporaryDirectory() as directory:
+            Image.fromarray(image).save(os.path.join(directory, 'input.png'))
+            cache_dir = os.path.join(directory, 'cache')
+
+            server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHTTPRequestHandler, directory=directory))
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+
+            url = f'http://127.0.0.1:{server.server_address[1]}/input.png'
+            try:
+                self.assertTrue(np.array_equal(parse_image(url, cache_dir=cache_dir), image))
+            finally:
+                server.shutdown()
+                server.server_close()
+
+            # the server is gone, the download and decoded image are cached
+            self.assertTrue(np.array_equal(parse_image(url, cache_dir=cache_dir), image))
+
+class SaveOutputTest(unittest.TestCase):
+    def test_matches_pasted_patches(self):
+        rng = np.random.default_rng(0)
+        patches = np.empty(3, dtype=object)
+        for i in range(len(patches)):
+            patches[i] = rng.integers(1, 256, size=(2, 3, 4), dtype=np.uint8)
+
+        # a non square output with unassigned output parts
+        output = rng.integers(-1, len(patches), size=(5, 7))
+
+        expected = np.zeros((5 * 2, 7 * 3, 4), dtype=np.uint8)
+        for (r, c), state in np.ndenumerate(output):
+            if state != -1:
+                expected[r*2:(r+1)*2, c*3:(c+1)*3] = patches[state]
+
+        with tempfile.TemporaryDirectory() as directory:
+            # the second output is streamed in strips
+            for max_pixels in [2**26, 50]:
+                file_path = os.path.join(directory, f'output_{max_pixels}.png')
+                save_output(file_path, output, patches, 'image', max_pixels=max_pixels)
+
+                self.assertTrue(np.array_equal(np.array(Image.open(file_path).convert('RGBA')), expected))
+
+if __name__ == '__main__':
+    unittest.main()
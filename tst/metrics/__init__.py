@@ -0,0 +1,51 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from qca import create_neighborhood, quantum_collapse
+from qca.collapse import BinaryCollapse
+from qca.decoherence import PriorityEntropyDechorence
+from qca.metrics import Metrics
+from tst.fixtures import banded_adjacency_constraint
+
+class MetricsTest(unittest.TestCase):
+    def test_metrics_do_not_change_the_output(self):
+        num_states = 4
+        neighborhood = create_neighborhood(num_dimensions=2)
+
+        states = np.arange(num_states)
+        adjacency_contraint = banded_adjacency_constraint(num_states, neighborhood)
+
+        random.seed(0)
+        np.random.seed(0)
+        consistent, assignments, _ = quantum_collapse(states, (8, 8), neighborhood, adjacency_contraint,
+                                                      dechorence_selector=PriorityEntropyDechorence(), collapse=BinaryCollapse())
+
+        metrics = Metrics()
+        random.seed(0)
+        np.random.seed(0)
+        metrics_consistent, metrics_assignments, _ = quantum_collapse(states, (8, 8), neighborhood, adjacency_contraint, dechorence_selector=PriorityEntropyDechorence(metrics=metrics),
+                                                                      collapse=BinaryCollapse(metrics=metrics), metrics=metrics)
+
+        self.assertEqual(consistent, metrics_consistent)
+        self.assertTrue(np.array_equal(assignments, metrics_assignments))
+
+        self.assertGreater(metrics.counters['selections'], 0)
+        self.assertGreaterEqual(metrics.counters['collapses'], metrics.counters['selections'])
+        self.assertGreater(metrics.counters['propagation_pops'], 0)
+        for phase in ['setup', 'select', 'collapse', 'propagate', 'finish']:
+            self.assertIn(phase, metrics.timers)
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'profile.json')
+            metrics.save(file_path)
+
+            with open(file_path) as file:
+                self.assertEqual(json.load(file)['counters'], metrics.counters)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from multiprocessing import shared_memory
+from unittest import mock
+
+import numpy as np
+
+import qca.parallel
+from qca import create_neighborhood, feasible_on_neighborhood_constraint
+from qca.parallel import quantum_collapse_parallel
+from tst.fixtures import random_adjacency_constraint
+
+class ParallelTest(unittest.TestCase):
+    def setUp(self):
+        self.num_states = 6
+        self.neighborhood = create_neighborhood(num_dimensions=2)
+
+        self.adjacency_contraint = random_adjacency_constraint(self.num_states, self.neighborhood, 0.5, seed=1)
+
+    def test_consistent_feasible_and_replayable(self):
+        created = []
+
+        class RecordingSharedMemory(shared_memory.SharedMemory):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                created.append(self.name)
+
+        for workers in [1, 2]:
+            with mock.patch.object(qca.parallel.shared_memory, 'SharedMemory', RecordingSharedMemory):
+                consistent, assignments, attempt_seed = quantum_collapse_parallel(range(self.num_states), (8, 8), self.neighborhood, self.adjacency_contraint,
+                                                                                  workers=workers, attempts=16, seed=0, backtrack_limit=10)
+
+            self.assertTrue(consistent)
+            self.assertTrue(np.all(assignments != -1))
+            self.assertTrue(feasible_on_neighborhood_constraint(assignments, self.adjacency_contraint, self.neighborhood))
+
+            replayed_consistent, replayed_assignments, replayed_seed = quantum_collapse_parallel(range(self.num_states), (8, 8), self.neighborhood, self.adjacency_contraint,
+                                                                                                 workers=1, attempt_seed=attempt_seed, backtrack_limit=10)
+            self.assertEqual(replayed_seed, attempt_seed)
+            self.assertTrue(replayed_consistent)
+            self.assertTrue(np.array_equal(replayed_assignments, assignments))
+
+        # only the pool shares the adjacency tensor and it is unlinked afterwards
+        self.assertEqual(len(created), 1)
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=created[0])
+
+if __name__ == '__main__':
+    unittest.main()
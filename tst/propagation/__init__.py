@@ -0,0 +1,31 @@
+import random
+import unittest
+
+import numpy as np
+
+from qca import create_neighborhood, quantum_collapse
+from qca.propagation import BitsetPropagation, QueuePropagation
+
+class PropagationTest(unittest.TestCase):
+    def test_bitset_matches_queue(self):
+        num_states = 6
+        neighborhood = create_neighborhood(num_dimensions=2)
+
+        rng = np.random.default_rng(3)
+        adjacency_contraint = (rng.random((num_states, len(neighborhood), num_states)) < 0.6).astype(float)
+
+        for seed in range(5):
+            results = []
+            for propagation in [QueuePropagation(), BitsetPropagation()]:
+                random.seed(seed)
+                np.random.seed(seed)
+                results.append(quantum_collapse(range(num_states), (5, 5), neighborhood, adjacency_contraint, propagation=propagation))
+
+            (consistent_1, assignments_1, output_1), (consistent_2, assignments_2, output_2) = results
+
+            self.assertEqual(consistent_1, consistent_2)
+            self.assertTrue(np.array_equal(assignments_1, assignments_2))
+            self.assertTrue(np.array_equal(output_1, output_2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,16 @@
+import os
+import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-from qca.quantum_computing import get_circuit_statevector, build_random_integer_circuit
+import numpy as np
+from qiskit.quantum_info import Operator
+
+import qca.quantum_computing
+from qca.quantum_computing import QuantumRandomnessPool, ResourceLimitError, get_circuit_statevector, build_random_integer_circuit, build_quantum_collapse_algorithm_circuit, build_quantum_collapse_neighborhood_constraint, count_neighborhood_constraint_mcts, estimate_quantum_collapse_resources, select_simulation_method, get_grover_circuits, grover_circuits_key
 
 class StateVectorTest(unittest.TestCase):
 
@@ -12,5 +22,168 @@ class StateVectorTest(unittest.TestCase):
         # states should be equally probable
         self.assertTrue(len(set(state_vector.data)) == 1)
 
+class QuantumRandomnessPoolTest(unittest.TestCase):
+
+    def test_choice_is_served_from_buffer(self):
+        pool = QuantumRandomnessPool(shots=64)
+
+        values = [pool.choice(list(range(5))) for _ in range(50)]
+
+        self.assertTrue(all(0 <= v < 5 for v in values))
+        # rejection sampling can draw more integers than choices
+        self.assertGreaterEqual(pool.hits + pool.misses, 50)
+        self.assertGreater(pool.hits, pool.misses)
+        self.assertGreaterEqual(pool.refills, 1)
+
+    def test_misses_wait_for_one_job(self):
+        # without background refills every thread misses on the empty buffer
+        pool = QuantumRandomnessPool(shots=64, refill_fraction=0)
+        jobs = []
+
+        def run_random_integer_job(num_bits):
+            jobs.append(num_bits)
+            time.sleep(0.1)
+            return list(range(pool.shots))
+
+        pool._run_random_integer_job = run_random_integer_job
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            values = list(executor.map(lambda _: pool.random_integer(6), range(8)))
+
+        self.assertEqual(jobs, [6])
+        self.assertEqual(sorted(values), list(range(8)))
+        self.assertEqual((pool.hits, pool.misses, pool.refills), (0, 8, 1))
+
+    def test_miss_waits_for_the_background_refill(self):
+        pool = QuantumRandomnessPool(shots=4, refill_fraction=1)
+        jobs = []
+        refill_done = threading.Event()
+
+        # the background refill started by the first integer runs until refill_done is set
+        def run_random_integer_job(num_bits):
+            jobs.append(num_bits)
+            if len(jobs) == 2:
+                refill_done.wait()
+            return list(range(pool.shots))
+
+        pool._run_random_integer_job = run_random_integer_job
+
+        # the first integer runs a job and starts the background refill, the next three empty the buffer
+        for _ in range(4):
+            pool.random_integer(2)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            value = executor.submit(pool.random_integer, 2)
+            try:
+                time.sleep(0.1)
+
+                # the fifth integer waits for the background refill instead of running another job
+                self.assertEqual(len(jobs), 2)
+                self.assertFalse(value.done())
+            finally:
+                refill_done.set()
+
+            self.assertIn(value.result(), range(4))
+
+        self.assertEqual(pool.misses, 2)
+
+class OracleSynthesisTest(unittest.TestCase):
+
+    def test_esop_matches_minterm(self):
+        rng = np.random.default_rng(0)
+        neighborhood = [(1,), (-1,)]
+
+        for num_states in [3, 4]:
+            C_n = (rng.random((num_states, len(neighborhood), num_states)) < 0.5).astype(float)
+            output = np.ones((2, num_states))
+
+            circuit, _, (neighborhood_constraint_qrs, neighborhood_constraint_output_mapping), _ = build_quantum_collapse_algorithm_circuit(range(num_states), neighborhood, output)
+
+            minterm_circuit = build_quantum_collapse_neighborhood_constraint(circuit, C_n, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, clone_circuit=True, synthesis='minterm')
+            esop_circuit = build_quantum_collapse_neighborhood_constraint(circuit, C_n, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, clone_circuit=True, synthesis='esop')
+
+            self.assertTrue(Operator(minterm_circuit).equiv(Operator(esop_circuit)))
+            self.assertLess(count_neighborhood_constraint_mcts(C_n, neighborhood_constraint_output_mapping, 'esop'), count_neighborhood_constraint_mcts(C_n, neighborhood_constraint_output_mapping, 'minterm'))
+
+class ResourceEstimateTest(unittest.TestCase):
+
+    def test_estimate_matches_circuit(self):
+        neighborhood = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+        C_n = (np.random.default_rng(0).random((4, len(neighborhood), 4)) < 0.5).astype(float)
+
+        circuit, _, (neighborhood_constraint_qrs, neighborhood_constraint_output_mapping), _ = build_quantum_collapse_algorithm_circuit(range(4), neighborhood, np.ones((2, 2, 4)))
+
+        for synthesis in ['minterm', 'esop']:
+            estimate = estimate_quantum_collapse_resources((2, 2), neighborhood, C_n, num_iterations=2, synthesis=synthesis)
+
+            self.assertEqual(estimate['qubits'], circuit.num_qubits)
+            self.assertEqual(estimate['statevector_memory'], 16 * 2**circuit.num_qubits)
+            # the constraint is computed and uncomputed, the feasibility check and diffuser have one mct each
+            self.assertEqual(estimate['mcts'], 2 * (2 * count_neighborhood_constraint_mcts(C_n, neighborhood_constraint_output_mapping, synthesis) + 2))
+
+    def test_select_simulation_method(self):
+        estimate = {'qubits': 40, 'mcts': 100, 't_count': 5000, 'statevector_memory': 16 * 2**40}
+
+        self.assertEqual(select_simulation_method(dict(estimate, qubits=20, statevector_memory=16 * 2**20)), 'statevector')
+        self.assertEqual(select_simulation_method(estimate), 'matrix_product_state')
+        self.assertEqual(select_simulation_method(dict(estimate, mcts=5000, t_count=10)), 'extended_stabilizer')
+
+        with self.assertRaises(ResourceLimitError):
+            select_simulation_method(dict(estimate, mcts=5000))
+
+class GroverCircuitsCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.neighborhood = [(1,), (-1,)]
+        self.C_n = np.array([[[1, 1], [1, 0]], [[0, 1], [1, 1]]], dtype=float)
+        self.circuit, (self.output_qrs, _), (self.neighborhood_constraint_qrs, self.neighborhood_constraint_output_mapping), _ = build_quantum_collapse_algorithm_circuit(
+            range(2), self.neighborhood, np.ones((2, 2)))
+
+        qca.quantum_computing._grover_circuits.clear()
+        self.addCleanup(qca.quantum_computing._grover_circuits.clear)
+
+    def get_grover_circuits(self, **kwargs):
+        return get_grover_circuits(self.circuit, self.C_n, self.output_qrs, self.neighborhood_constraint_qrs, self.neighborhood_constraint_output_mapping, **kwargs)
+
+    def key(self, C_n, **kwargs):
+        return grover_circuits_key(self.circuit, C_n, self.neighborhood_constraint_output_mapping, **kwargs)
+
+    def test_memory_and_disk_cache(self):
+        build_oracle = qca.quantum_computing.build_quantum_collapse_oracle
+
+        with tempfile.TemporaryDirectory() as cache_dir, mock.patch.object(qca.quantum_computing, 'build_quantum_collapse_oracle', side_effect=build_oracle) as build:
+            oracle, diffuser_circuit = self.get_grover_circuits(cache_dir=cache_dir)
+            self.assertEqual(build.call_count, 1)
+
+            # the second call is served from memory
+            self.assertIs(self.get_grover_circuits(cache_dir=cache_dir)[0], oracle)
+
+            # a new process would load the qpy file
+            qca.quantum_computing._grover_circuits.clear()
+            loaded_oracle, loaded_diffuser_circuit = self.get_grover_circuits(cache_dir=cache_dir)
+            self.assertEqual(build.call_count, 1)
+            self.assertTrue(Operator(loaded_oracle).equiv(Operator(oracle)))
+            self.assertTrue(Operator(loaded_diffuser_circuit).equiv(Operator(diffuser_circuit)))
+
+            # a corrupt file is rebuilt and overwritten
+            cache_path = os.path.join(cache_dir, f'grover_{self.key(self.C_n)}.qpy')
+            with open(cache_path, 'wb') as file:
+                file.write(b'corrupt')
+
+            qca.quantum_computing._grover_circuits.clear()
+            rebuilt_oracle, _ = self.get_grover_circuits(cache_dir=cache_dir)
+            self.assertEqual(build.call_count, 2)
+            self.assertTrue(Operator(rebuilt_oracle).equiv(Operator(oracle)))
+            self.assertGreater(os.path.getsize(cache_path), len(b'corrupt'))
+            self.assertEqual(os.listdir(cache_dir), [os.path.basename(cache_path)])
+
+    def test_key(self):
+        key = self.key(self.C_n)
+
+        self.assertEqual(key, self.key(self.C_n.copy()))
+        self.assertNotEqual(key, self.key(1 - self.C_n))
+        self.assertNotEqual(key, self.key(self.C_n, synthesis='minterm'))
+        self.assertNotEqual(key, self.key(self.C_n, edge_constraints=[np.ones((2, 2), dtype=bool)]))
+        self.assertNotEqual(self.key(self.C_n, edge_constraints=[np.ones((2, 2), dtype=bool)]), self.key(self.C_n, edge_constraints=[np.eye(2, dtype=bool)]))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from qca import create_neighborhood
+from qca.input import create_adjacency_matrix, create_patches, parse_input_directory, unique_patches
+from qca.ruleset import compile_ruleset, get_ruleset, read_input_bytes
+
+class RulesetTest(unittest.TestCase):
+    def test_compiled_once_and_memory_mapped(self):
+        rng = np.random.default_rng(0)
+        tiles = rng.integers(4, size=(4, 2, 2, 4), dtype=np.uint8)
+        image = np.concatenate([np.concatenate(list(tiles[rng.integers(len(tiles), size=6)]), axis=1) for _ in range(5)], axis=0)
+        neighborhood = create_neighborhood(num_dimensions=2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'input.png')
+            Image.fromarray(image).save(file_path)
+            cache_dir = os.path.join(directory, 'rulesets')
+
+            ruleset, key = get_ruleset(file_path, (2, 2), neighborhood, cache_dir)
+            cached_ruleset, cached_key = get_ruleset(file_path, (2, 2), neighborhood, cache_dir)
+
+            self.assertEqual(key, cached_key)
+            self.assertEqual(os.listdir(cache_dir), [f'ruleset_{key}'])
+            # no temporary files are left behind
+            self.assertEqual(sorted(os.listdir(os.path.join(cache_dir, f'ruleset_{key}'))),
+                             ['adjacency_matrix.npy', 'atlas.npy', 'counts.npy', 'patch_states.npy', 'ruleset.json'])
+            self.assertIsInstance(cached_ruleset.adjacency_matrix, np.memmap)
+
+            patches, _, input_type = create_patches(file_path, (2, 2))
+            states, counts, patch_states = unique_patches(patches.flatten())
+
+            self.assertEqual(cached_ruleset.input_type, input_type)
+            self.assertTrue(np.array_equal(cached_ruleset.counts, counts))
+            self.assertTrue(np.array_equal(cached_ruleset.patch_states.reshape(-1), patch_states))
+            self.assertTrue(np.array_equal(cached_ruleset.adjacency_matrix, create_adjacency_matrix(states, neighborhood)))
+            for state, patch in zip(states, cached_ruleset.patches):
+                self.assertTrue(np.array_equal(state, patch))
+
+            # another patch size or input is another ruleset
+            _, other_key = get_ruleset(file_path, (1, 2), neighborhood, cache_dir)
+            self.assertNotEqual(key, other_key)
+
+            Image.fromarray(image[::-1]).save(file_path)
+            _, other_key = get_ruleset(file_path, (2, 2), neighborhood, cache_dir)
+            self.assertNotEqual(key, other_key)
+
+    def test_directory_input(self):
+        rng = np.random.default_rng(1)
+        tiles = rng.integers(256, size=(3, 2, 2, 4), dtype=np.uint8)
+        neighborhood = create_neighborhood(num_dimensions=2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            input_directory = os.path.join(directory, 'input')
+            os.makedirs(input_directory)
+            # the second and fourth file are the same patch
+            for i, tile in enumerate([tiles[0], tiles[1], tiles[2], tiles[1]]):
+                Image.fromarray(tile).save(os.path.join(input_directory, f'{i}.png'))
+
+            input_cache_dir = os.path.join(directory, 'decoded')
+            ruleset, _ = get_ruleset(input_directory, (2, 2), neighborhood, os.path.join(directory, 'rulesets'), input_cache_dir=input_cache_dir)
+
+            # the files are decoded by parse_input_directory and cached
+            with mock.patch('qca.ruleset.parse_input_directory', wraps=parse_input_directory) as parse:
+                compile_ruleset(read_input_bytes(input_directory), (2, 2), neighborhood, directory=input_directory, input_cache_dir=input_cache_dir)
+            parse.assert_called_once_with(input_directory, cache_dir=input_cache_dir)
+            self.assertEqual(len([f for f in os.listdir(input_cache_dir) if f.startswith('image_')]), 3)
+
+        self.assertEqual(ruleset.input_type, 'image')
+        self.assertEqual(len(ruleset.atlas), 3)
+        self.assertTrue(np.array_equal(ruleset.counts[ruleset.patch_states.reshape(-1)], [1, 2, 1, 2]))
+
+if __name__ == '__main__':
+    unittest.main()
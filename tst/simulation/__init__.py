@@ -0,0 +1,71 @@
+import tracemalloc
+import unittest
+from unittest import mock
+
+import numpy as np
+from qiskit.quantum_info import Statevector
+
+from qca import create_neighborhood, feasible_on_neighborhood_constraint
+from qca.input import create_neighborhood_constraint_from_example
+from qca.quantum_computing import build_quantum_collapse_algorithm_circuit, build_quantum_collapse_grover_search_circuit, grover_search_layout, set_quantum_collapse_algorithm_superposition
+from qca.backends import ResourceLimitError
+from qca.simulation import grover_feasibility_mask, grover_memory, grover_probabilities, sample_grover_search
+
+class NumpyGroverTest(unittest.TestCase):
+    def setUp(self):
+        self.states = np.array(['a', 'b', 'c'])
+        self.neighborhood = create_neighborhood(num_dimensions=2)
+        self.c_n = create_neighborhood_constraint_from_example(self.states, np.array([['a', 'a', 'b'], ['a', 'c', 'b']]), self.neighborhood)
+
+    def test_feasibility_mask(self):
+        output_parts, edges = grover_search_layout((2, 2), self.neighborhood, self.c_n)
+        feasible = grover_feasibility_mask(output_parts, edges)
+
+        for basis_state in range(len(feasible)):
+            # 2 qubits per output part, the first output part in the lowest bits
+            assignments = np.array([(basis_state >> (2 * i)) & 3 for i in range(4)]).reshape(2, 2)
+
+            expected = bool(np.all(assignments < len(self.states))) and feasible_on_neighborhood_constraint(assignments, self.c_n, self.neighborhood)
+            self.assertEqual(feasible[basis_state], expected)
+
+    def test_probabilities_match_circuit(self):
+        output_parts, edges = grover_search_layout((2, 2), self.neighborhood, self.c_n)
+
+        circuit, (output_qrs, _), (neighborhood_constraint_qrs, neighborhood_constraint_output_mapping), feasible_qr = build_quantum_collapse_algorithm_circuit(self.states, self.neighborhood, np.ones((2, 2, len(self.states))))
+        set_quantum_collapse_algorithm_superposition(circuit, output_qrs)
+        circuit.x(feasible_qr)
+        circuit.h(feasible_qr)
+        circuit.append(build_quantum_collapse_grover_search_circuit(circuit, self.c_n, output_qrs, neighborhood_constraint_qrs, neighborhood_constraint_output_mapping, num_iterations=2, to_gate=True), circuit.qubits)
+
+        output_qubits = [circuit.find_bit(qubit).index for output_qr in output_qrs for qubit in output_qr]
+        circuit_probabilities = Statevector.from_instruction(circuit).probabilities(qargs=output_qubits)
+
+        self.assertTrue(np.allclose(grover_probabilities(output_parts, edges, num_iterations=2), circuit_probabilities))
+
+    def test_chunked_feasibility_mask(self):
+        output_parts, edges = grover_search_layout((2, 2), self.neighborhood, self.c_n)
+        feasible = grover_feasibility_mask(output_parts, edges)
+
+        # chunks that do not divide the number of basis states
+        with mock.patch('qca.simulation.MASK_CHUNK_SIZE', 7):
+            self.assertTrue(np.array_equal(grover_feasibility_mask(output_parts, edges), feasible))
+
+    def test_memory_limit_holds(self):
+        output_parts, edges = grover_search_layout((3, 3), self.neighborhood, self.c_n)
+        num_qubits = sum(num_qubits for _, _, num_qubits in output_parts)
+
+        with self.assertRaises(ResourceLimitError):
+            sample_grover_search(output_parts, edges, 1, 16, max_memory=grover_memory(num_qubits) - 1)
+
+        tracemalloc.start()
+        try:
+            measurements = sample_grover_search(output_parts, edges, 1, 16, rng=np.random.default_rng(0), max_memory=grover_memory(num_qubits))
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertLessEqual(peak_memory, grover_memory(num_qubits))
+        self.assertEqual(len(measurements), 16)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from qca import create_neighborhood, feasible_on_neighborhood_constraint
+from qca.input import save_output_strips
+from qca.metrics import Metrics
+from qca.tiled import quantum_collapse_tiled
+from tst.fixtures import banded_adjacency_constraint
+
+class TiledTest(unittest.TestCase):
+    def test_tiles_agree_on_borders(self):
+        num_states = 4
+        neighborhood = create_neighborhood(num_dimensions=2)
+
+        states = np.arange(num_states)
+        adjacency_contraint = banded_adjacency_constraint(num_states, neighborhood)
+
+        patches = np.empty(num_states, dtype=object)
+        for s in states:
+            patches[s] = np.full((2, 3, 4), s * 60, dtype=np.uint8)
+
+        random.seed(0)
+        np.random.seed(0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            assignments_path = os.path.join(directory, 'assignments.npy')
+            consistent, assignments = quantum_collapse_tiled(states, (11, 9), neighborhood, adjacency_contraint, (4, 4), assignments_path=assignments_path)
+
+            self.assertTrue(consistent)
+            self.assertTrue(np.array_equal(np.load(assignments_path), assignments))
+            self.assertTrue(np.all(assignments != -1))
+            self.assertTrue(feasible_on_neighborhood_constraint(np.asarray(assignments), adjacency_contraint, neighborhood))
+
+            file_path = os.path.join(directory, 'output.png')
+            save_output_strips(file_path, assignments, patches, 'image', strip_size=4)
+            image = np.array(Image.open(file_path))
+
+        self.assertEqual(image.shape, (11 * 2, 9 * 3, 4))
+        self.assertTrue(np.array_equal(image[::2, ::3, 0], assignments * 60))
+
+    def test_empty_domain_is_not_attempted(self):
+        num_states = 4
+        neighborhood = create_neighborhood(num_dimensions=2)
+        adjacency_contraint = banded_adjacency_constraint(num_states, neighborhood)
+
+        # the first three tiles leave no state for the last one, it is next to a 0 and a 3
+        tile_outputs = iter([0, 0, 3])
+
+        def collapse_tile(states, tile_shape, *args, **kwargs):
+            return True, np.full(tile_shape, next(tile_outputs)), None
+
+        metrics = Metrics()
+        with mock.patch('qca.tiled.quantum_collapse', side_effect=collapse_tile) as quantum_collapse:
+            consistent, assignments = quantum_collapse_tiled(range(num_states), (2, 2), neighborhood, adjacency_contraint, (1, 1), metrics=metrics)
+
+        self.assertFalse(consistent)
+        self.assertEqual(quantum_collapse.call_count, 3)
+        self.assertTrue(np.array_equal(assignments, [[0, 0], [3, -1]]))
+        self.assertEqual(metrics.counters['tile_contradictions'], 1)
+        self.assertEqual(metrics.counters['tiles'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from qca import create_neighborhood
+from qca.topology import GridTopology, OUT_OF_BOUNDS
+
+class GridTopologyTest(unittest.TestCase):
+    def test_neighbor_tables(self):
+        neighborhood = create_neighborhood(num_dimensions=2)
+        shape = (3, 4)
+        topology = GridTopology(neighborhood, shape)
+
+        self.assertEqual(topology.size, 12)
+        self.assertEqual(topology.neighbors.shape, (12, len(neighborhood)))
+
+        for flat_index, index in enumerate(np.ndindex(shape)):
+            self.assertEqual(topology.index(flat_index), index)
+            self.assertEqual(topology.flat_index(index), flat_index)
+
+            for n_i, n in enumerate(neighborhood):
+                neighbor_index = tuple(np.array(index) + np.array(n))
+                if all(0 <= i < s for i, s in zip(neighbor_index, shape)):
+                    expected = int(np.ravel_multi_index(neighbor_index, shape))
+                else:
+                    expected = OUT_OF_BOUNDS
+
+                self.assertEqual(topology.neighbors[flat_index, n_i], expected)
+                self.assertEqual(topology.neighbor_lists[flat_index][n_i], expected)
+
+        edges = list(topology.edges())
+        self.assertEqual(len(edges), int(np.sum(topology.neighbors != OUT_OF_BOUNDS)))
+        self.assertTrue(all(neighbor_flat_index != OUT_OF_BOUNDS for _, _, neighbor_flat_index in edges))
+
+    def test_python_tables_are_built_on_first_use(self):
+        topology = GridTopology(create_neighborhood(num_dimensions=2), (2, 2))
+
+        self.assertNotIn('indexes', vars(topology))
+        self.assertNotIn('neighbor_lists', vars(topology))
+
+        topology.index(3)
+        self.assertIn('indexes', vars(topology))
+
+if __name__ == '__main__':
+    unittest.main()